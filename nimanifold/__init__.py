@@ -4,6 +4,13 @@ __author__ = """Jacob C Reinhold"""
 __email__ = 'jcreinhold@gmail.com'
 __version__ = '0.1.0'
 
-from nimanifold.data import *
-from nimanifold.plot import *
-from nimanifold.types import Sample
+from nimanifold.lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['types'],
+    submod_attrs={
+        'types': ['Sample'],
+    },
+    subpackages=['data', 'embed', 'plot']
+)
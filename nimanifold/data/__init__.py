@@ -1,2 +1,12 @@
-from nimanifold.data.csv import *
-from nimanifold.data.sample import *
+from nimanifold.lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['csv', 'load', 'loader'],
+    submod_attrs={
+        'csv': ['iacl_csv', 'get_contrast_map', 'get_patient_id_map', 'get_site_map'],
+        'loader': ['BatchLoader'],
+        'load': ['load_masked_volume', 'load_volume', 'mask_bbox', 'prefetch'],
+    },
+    subpackages=['sample']
+)
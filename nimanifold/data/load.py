@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+nimanifold.data.load
+
+load NIfTI volumes, optionally reading ahead in background threads
+
+Author: Jacob Reinhold (jcreinhold@gmail.com)
+
+Created on: Oct. 19, 2026
+"""
+
+__all__ = [
+    'load_masked_volume',
+    'load_volume',
+    'mask_bbox',
+    'prefetch'
+]
+
+from typing import *
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import nibabel as nib
+import numpy as np
+
+from nimanifold.types import *
+
+# use a faster gzip implementation for .nii.gz files if one is installed
+try:
+    from isal import igzip as fast_gzip
+except ImportError:
+    try:
+        from zlib_ng import gzip_ng as fast_gzip
+    except ImportError:
+        fast_gzip = None
+
+
+def _is_gzip(filename: str) -> bool:
+    return str(filename).endswith('.gz')
+
+
+def _nifti_class(header: bytes) -> Optional[type]:
+    """ NIfTI-1 or NIfTI-2 image class from `sizeof_hdr` in either byte order, if either """
+    for byteorder in ('little', 'big'):
+        sizeof_hdr = int.from_bytes(header[:4], byteorder)
+        if sizeof_hdr == 348:
+            return nib.Nifti1Image
+        if sizeof_hdr == 540:
+            return nib.Nifti2Image
+    return None
+
+
+def load_volume(filename: str,
+                dtype: Optional[DType] = np.float64,
+                bbox: Optional[Tuple[slice, slice, slice]] = None) -> Array:
+    """
+    load image data as `dtype` (with scaling applied) or its on-disk dtype if None;
+    if `bbox` is given, only that region is read (memory-mapped if uncompressed)
+    """
+    img = None
+    if bbox is None and fast_gzip is not None and _is_gzip(filename):
+        with fast_gzip.open(filename, 'rb') as f:
+            raw = f.read()
+        klass = _nifti_class(raw)
+        if klass is not None:
+            img = klass.from_bytes(raw)
+    if img is None:
+        img = nib.load(filename)
+    data = img.dataobj if bbox is None else img.dataobj[bbox]
+    if dtype is None:
+        return np.asanyarray(data)
+    if bbox is None and np.dtype(dtype) in (np.float32, np.float64):
+        return img.get_fdata(dtype=dtype)
+    return np.asarray(data, dtype=dtype)
+
+
+def mask_bbox(mask: Array, pad: int = 0) -> Tuple[slice, slice, slice]:
+    """ bounding box of the nonzero voxels in `mask`, padded by `pad` voxels """
+    bbox = []
+    for axis, size in enumerate(mask.shape):
+        idxs = np.flatnonzero(mask.any(axis=tuple(a for a in range(mask.ndim) if a != axis)))
+        if idxs.size == 0:
+            raise ValueError('Mask must contain at least one nonzero voxel.')
+        bbox.append(slice(max(idxs[0] - pad, 0), min(idxs[-1] + 1 + pad, size)))
+    return tuple(bbox)
+
+
+def load_masked_volume(filenames: Tuple[str, str],
+                       dtype: Optional[DType] = np.float64,
+                       pad: int = 0) -> Tuple[Array, Array, Loc, Shape]:
+    """
+    load the mask in `filenames = (image, mask)` and then only the image
+    voxels in the mask's bounding box (padded by `pad`); returns the
+    cropped image and mask, the origin of the crop, and the full shape.
+    if the mask is empty, the crop is empty (0 x 0 x 0) so it can be skipped
+    """
+    filename, mask_filename = filenames
+    mask = load_volume(mask_filename, dtype=None) > 0
+    header = nib.load(filename)  # only reads the header
+    if header.shape != mask.shape[-3:]:
+        raise ValueError(f'Image {filename} has shape {header.shape} '
+                         f'but mask {mask_filename} has shape {mask.shape}.')
+    if not mask.any():
+        dtype = header.get_data_dtype() if dtype is None else dtype
+        return np.empty((0, 0, 0), dtype=dtype), np.empty((0, 0, 0), dtype=bool), (0, 0, 0), mask.shape
+    bbox = mask_bbox(mask, pad)
+    img = load_volume(filename, dtype, bbox)
+    origin = tuple(int(s.start) for s in bbox)
+    return img, mask[bbox], origin, mask.shape
+
+
+def _nbytes(x: Any) -> int:
+    if isinstance(x, (tuple, list)):
+        return sum(_nbytes(xi) for xi in x)
+    return getattr(x, 'nbytes', 0)
+
+
+def prefetch(items: Iterable,
+             load: Callable = load_volume,
+             n_ahead: int = 2,
+             n_workers: int = 1,
+             max_bytes: Optional[int] = None) -> Iterator:
+    """
+    load items in order, reading up to `n_ahead` items ahead in
+    `n_workers` background threads while the current item is processed.
+    stops reading ahead once the buffered items exceed `max_bytes`
+    (estimated from the size of the last loaded item, so only one item
+    is in flight until the first is loaded); at least one item is
+    always in flight so progress is guaranteed
+    """
+    if n_ahead < 1:
+        for item in items:
+            yield load(item)
+        return
+    items = iter(items)
+    pending = deque()
+    estimate = None  # size of the last loaded item, unknown until one is loaded
+
+    def buffered() -> int:
+        # a failed load is counted as `estimate` so its exception is raised in order
+        return sum(_nbytes(f.result()) if f.done() and f.exception() is None else estimate for f in pending)
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        try:
+            while True:
+                while len(pending) < n_ahead and (not pending or max_bytes is None or
+                                                  (estimate is not None and buffered() + estimate <= max_bytes)):
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        break
+                    pending.append(executor.submit(load, item))
+                if not pending:
+                    break
+                out = pending.popleft().result()
+                estimate = _nbytes(out)
+                yield out
+        finally:
+            for f in pending:
+                f.cancel()
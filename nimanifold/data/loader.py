@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+nimanifold.data.loader
+
+iterate over shuffled minibatches of Samples saved in HDF5 files
+
+Author: Jacob Reinhold (jcreinhold@gmail.com)
+
+Created on: Oct. 19, 2026
+"""
+
+__all__ = [
+    'BatchLoader'
+]
+
+from typing import *
+
+from itertools import groupby
+from operator import itemgetter
+
+import h5py
+import numpy as np
+
+from nimanifold.types import *
+from nimanifold.data.load import prefetch
+from nimanifold.util import hdf5_chunk_rows, unique_rows
+
+BLOCK_BYTES = 2 ** 22
+FIELDS = ('data', 'locs', 'pids', 'sites', 'contrasts', 'ids')
+
+Block = Tuple[int, int, int]  # file index, first row, last row (exclusive)
+Batch = Dict[str, Array]
+
+
+def _interleave(codes: Array) -> Array:
+    """ order which cycles through the groups in `codes`, keeping the order within each group """
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+    counts = np.diff(np.r_[starts, codes.size])
+    rank = np.empty_like(order)
+    rank[order] = np.arange(codes.size) - np.repeat(starts, counts)
+    return np.lexsort((codes, rank))
+
+
+class BatchLoader:
+    """
+    minibatches of `fields` from one or more files saved with `Sample.to_hdf5`
+
+    rows are read in contiguous blocks aligned to the HDF5 chunks; the block
+    order is shuffled every epoch, `buffer_blocks` blocks are read together
+    in background threads, and the rows of each buffer are shuffled before
+    being split into batches. if `stratify` is one of pids, sites, or
+    contrasts, the rows of a buffer are interleaved by group so that each
+    batch holds about as many rows of each group.
+
+    batches are dicts of arrays written into `n_batch_buffers` preallocated
+    buffers, i.e., a batch is overwritten `n_batch_buffers` batches later;
+    copy it to keep it longer
+    """
+
+    def __init__(self,
+                 filenames: Union[str, Sequence[str]],
+                 batch_size: int = 256,
+                 fields: Optional[Sequence[str]] = None,
+                 shuffle: bool = True,
+                 stratify: Optional[str] = None,
+                 buffer_blocks: int = 16,
+                 block_size: Optional[int] = None,
+                 drop_last: bool = False,
+                 n_prefetch: int = 2,
+                 n_workers: int = 1,
+                 n_batch_buffers: int = 2,
+                 seed: Seed = None):
+        self.filenames = [filenames] if isinstance(filenames, str) else list(filenames)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.stratify = stratify
+        self.buffer_blocks = buffer_blocks
+        self.drop_last = drop_last
+        self.n_prefetch = n_prefetch
+        self.n_workers = n_workers
+        self.n_batch_buffers = n_batch_buffers
+        self.rng = np.random.default_rng(seed)
+        self.blocks = []
+        self.n_rows = 0
+        with h5py.File(self.filenames[0], 'r') as f:
+            if fields is None:
+                fields = [name for name in FIELDS if name in f]
+            self.fields = list(fields)
+            self.shapes = {name: f[name].shape[1:] for name in self.fields}
+            self.dtypes = {name: f[name].dtype for name in self.fields}
+        if stratify is not None and stratify not in self.fields:
+            raise ValueError(f'stratify {stratify} must be one of the fields {", ".join(self.fields)}.')
+        for i, fn in enumerate(self.filenames):
+            with h5py.File(fn, 'r') as f:
+                n = f['data'].shape[0]
+                step = hdf5_chunk_rows(f['data'], BLOCK_BYTES) if block_size is None else block_size
+            self.blocks.extend((i, start, min(start + step, n)) for start in range(0, n, step))
+            self.n_rows += n
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return self.n_rows // self.batch_size
+        return -(-self.n_rows // self.batch_size)
+
+    def __repr__(self) -> str:
+        s = '{name}(files={n_files}, rows={n_rows}, batch_size={batch_size})'
+        return s.format(name=self.__class__.__name__, n_files=len(self.filenames), **self.__dict__)
+
+    def _read_buffer(self, blocks: List[Block]) -> Batch:
+        """ read the rows of `blocks` (sorted for locality) into one dict of arrays """
+        parts = {name: [] for name in self.fields}
+        for i, file_blocks in groupby(sorted(blocks), key=itemgetter(0)):
+            with h5py.File(self.filenames[i], 'r') as f:
+                for _, start, stop in file_blocks:
+                    for name in self.fields:
+                        parts[name].append(f[name][start:stop])
+        return {name: np.concatenate(x) for name, x in parts.items()}
+
+    def _order(self, buffer: Batch) -> Array:
+        n = buffer[self.fields[0]].shape[0]
+        order = self.rng.permutation(n) if self.shuffle else np.arange(n)
+        if self.stratify is not None:
+            _, codes = unique_rows(buffer[self.stratify])
+            codes = codes[order]
+            order = order[_interleave(codes)]
+        return order
+
+    def __iter__(self) -> Iterator[Batch]:
+        blocks = list(self.blocks)
+        if self.shuffle:
+            blocks = [blocks[i] for i in self.rng.permutation(len(blocks))]
+        buffers = [blocks[i:i + self.buffer_blocks] for i in range(0, len(blocks), self.buffer_blocks)]
+        outs = [{name: np.empty((self.batch_size,) + self.shapes[name], dtype=self.dtypes[name])
+                 for name in self.fields} for _ in range(self.n_batch_buffers)]
+        n_batches, filled = 0, 0
+        for buffer in prefetch(buffers, self._read_buffer, self.n_prefetch, self.n_workers):
+            order, pos = self._order(buffer), 0
+            while pos < order.size:
+                out = outs[n_batches % self.n_batch_buffers]
+                k = min(order.size - pos, self.batch_size - filled)
+                idxs = order[pos:pos + k]
+                for name in self.fields:
+                    # idxs are in range; mode='raise' would make numpy buffer `out`
+                    np.take(buffer[name], idxs, axis=0, out=out[name][filled:filled + k], mode='clip')
+                pos += k
+                filled += k
+                if filled == self.batch_size:
+                    yield out
+                    n_batches += 1
+                    filled = 0
+        if filled > 0 and not self.drop_last:
+            out = outs[n_batches % self.n_batch_buffers]
+            yield {name: x[:filled] for name, x in out.items()}
@@ -1,5 +1,10 @@
-__all__ = [
-    'get_samples',
-]
+from nimanifold.lazy import attach
 
-from nimanifold.data.sample.sample import get_samples
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['features', 'random', 'sample', 'step', 'util'],
+    submod_attrs={
+        'features': ['FEATURES', 'register_feature'],
+        'sample': ['get_samples'],
+    }
+)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+nimanifold.data.sample.features
+
+compact feature vectors computed from a batch of patches
+
+Author: Jacob Reinhold (jcreinhold@gmail.com)
+
+Created on: Oct. 19, 2026
+"""
+
+__all__ = [
+    'FEATURES',
+    'extract_features',
+    'register_feature'
+]
+
+from typing import *
+
+import numpy as np
+
+from nimanifold.types import *
+
+Extractor = Callable[[Array], Array]
+Features = Union[str, Extractor, Sequence[Union[str, Extractor]]]
+
+FEATURES: Dict[str, Extractor] = {}
+
+
+def register_feature(name: str) -> Callable[[Extractor], Extractor]:
+    """
+    register a function which maps a batch of patches (N x w x w x w)
+    to features (N x F) so it can be selected by `name` in `get_samples`
+    """
+    def decorator(fn: Extractor) -> Extractor:
+        FEATURES[name] = fn
+        return fn
+    return decorator
+
+
+@register_feature('raw')
+def raw(patches: Array) -> Array:
+    return patches.reshape(patches.shape[0], -1)
+
+
+@register_feature('histogram')
+def histogram(patches: Array, bins: int = 16, value_range: Optional[Tuple[float, float]] = None) -> Array:
+    """
+    normalized intensity histogram with bins spanning `value_range`, or each
+    patch's own min to max if None, so a patch's features never depend on
+    the other patches in its batch
+    """
+    x = raw(patches).astype(np.float64)
+    if value_range is None:
+        lo, hi = x.min(axis=1, keepdims=True), x.max(axis=1, keepdims=True)
+    else:
+        lo, hi = value_range
+    width = np.where(hi > lo, np.subtract(hi, lo), 1.)
+    idxs = np.clip(np.floor((x - lo) * (bins / width)).astype(np.intp), 0, bins - 1)
+    idxs += np.arange(x.shape[0])[:, None] * bins
+    counts = np.bincount(idxs.ravel(), minlength=x.shape[0] * bins)
+    return counts.reshape(x.shape[0], bins) / x.shape[1]
+
+
+@register_feature('quantiles')
+def quantiles(patches: Array, q: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> Array:
+    return np.quantile(raw(patches), q, axis=1).T
+
+
+@register_feature('gradient')
+def gradient(patches: Array) -> Array:
+    """ mean, std, median, and 90th percentile of the gradient magnitude """
+    grads = np.gradient(patches, axis=(1, 2, 3))
+    mag = raw(np.sqrt(sum(g ** 2 for g in grads)))
+    return np.column_stack((mag.mean(axis=1), mag.std(axis=1), *np.quantile(mag, (0.5, 0.9), axis=1)))
+
+
+@register_feature('downsample')
+def downsample(patches: Array, factor: int = 4) -> Array:
+    """ mean over non-overlapping `factor`-sized blocks (the remainder is cropped) """
+    n, *shape = patches.shape
+    h, w, d = [s // factor for s in shape]
+    x = patches[:, :h * factor, :w * factor, :d * factor]
+    x = x.reshape(n, h, factor, w, factor, d, factor)
+    return raw(x.mean(axis=(2, 4, 6)))
+
+
+def _get_extractor(feature: Union[str, Extractor]) -> Extractor:
+    if callable(feature):
+        return feature
+    if feature not in FEATURES:
+        raise ValueError(f'feature {feature} invalid. needs to be one of {", ".join(FEATURES)}.')
+    return FEATURES[feature]
+
+
+def extract_features(patches: Union[Array, List[Array]], features: Optional[Features] = None) -> Array:
+    """ concatenate the features named in (or given by) `features`; raw voxels if None """
+    patches = np.asarray(patches)
+    if features is None:
+        return raw(patches)
+    if isinstance(features, str) or callable(features):
+        features = [features]
+    return np.concatenate([_get_extractor(f)(patches) for f in features], axis=1)
@@ -15,8 +15,11 @@ from nimanifold.types import *
 
 import numpy as np
 
+from nimanifold.data.sample.features import Features, extract_features
 from nimanifold.data.sample.util import (
     middle_slices,
+    voxel_locs,
+    _empty_data_locs_slices,
     _middle_loc
 )
 
@@ -53,14 +56,24 @@ class CropBase:
         self.pct = pct
         self.axis = axis
 
-    def _get_sample_idxs(self, img: Array) -> Loc:
+    def foreground(self, img: Array) -> Tuple[Array, Array, Array]:
         """ get the set of indices from which to sample (foreground) """
+        return np.where(img >= (img.mean() if self.thresh is None else self.thresh))
+
+    def _get_sample_idxs(self, img: Array, fg: Optional[Tuple[Array, Array, Array]] = None) -> Loc:
         # mask is a tuple of length 3
-        mask = np.where(img >= (img.mean() if self.thresh is None else self.thresh))
+        mask = self.foreground(img) if fg is None else fg
         c = np.random.randint(0, len(mask[0]))  # choose the set of idxs to use
         h, w, d = [m[c] for m in mask]  # pull out the chosen idxs
         return h, w, d
 
+    def sample_centers(self, img: Array, mask: Optional[Array] = None) -> List[Loc]:
+        """ choose `n_samples` foreground (or `mask`) voxels, computing the foreground once """
+        *cs, _, _, _ = img.shape
+        x = img[0] if len(cs) > 0 else img  # use the first image to determine sampling, if multimodal
+        fg = self.foreground(x) if mask is None else np.where(mask)
+        return [self._get_sample_idxs(x, fg) for _ in range(self.n_samples)]
+
     def _offset_by_pct(self, h: int, w: int, d: int) -> Tuple[Loc, Loc]:
         s = (h, w, d)
         hml = wml = dml = 0
@@ -99,16 +112,17 @@ class RandomCrop3D(CropBase):
                  axis: int = 0):
         super().__init__(3, output_size, n_samples, threshold, pct, axis)
 
-    def __call__(self, img: Array) -> Tuple[List[Array], List[Index]]:
+    def __call__(self, img: Array, centers: Optional[List[Loc]] = None) -> Tuple[List[Array], List[Index]]:
+        """ crop around `centers` (moved inside the image if needed) or random foreground voxels """
         *cs, h, w, d = img.shape
         hh, ww, dd = self.output_size
         (hml, wml, dml), (hmh, wmh, dmh) = self._offset_by_pct(h, w, d)
         max_idxs = (h - hmh - hh // 2, w - wmh - ww // 2, d - dmh - dd // 2)
         min_idxs = (hml + hh // 2, wml + ww // 2, dml + dd // 2)
-        x = img[0] if len(cs) > 0 else img  # use the first image to determine sampling, if multimodal
+        if centers is None:
+            centers = self.sample_centers(img)
         samples, idxs = [], []
-        for _ in range(self.n_samples):
-            s_idxs = self._get_sample_idxs(x)
+        for s_idxs in centers:
             i, j, k = [i if min_i <= i <= max_i else max_i if i > max_i else min_i
                        for max_i, min_i, i in zip(max_idxs, min_idxs, s_idxs)]
             oh = 0 if hh % 2 == 0 else 1
@@ -124,13 +138,23 @@ class RandomCrop3D(CropBase):
 
 
 def random_patches(img: Array,
-                   window: int = 40,
+                   window: Union[int, Sequence[int]] = 40,
                    n_samples: int = 1,
                    threshold: float = 0.,
-                   **kwargs) -> Tuple[List[Array], List[Index]]:
-    cropper = RandomCrop3D(window, n_samples, threshold)
-    patches, idxs = cropper(img)
-    return patches, idxs
+                   mask: Optional[Array] = None,
+                   **kwargs) -> Union[Tuple[List[Array], List[Index]], List[Tuple[List[Array], List[Index]]]]:
+    """
+    crop windows around random foreground voxels (or voxels in `mask`);
+    if `window` is a sequence, the same centers are used for every
+    window size and a (patches, idxs) pair is returned for each
+    """
+    if isinstance(window, int):
+        cropper = RandomCrop3D(window, n_samples, threshold)
+        patches, idxs = cropper(img, None if mask is None else cropper.sample_centers(img, mask))
+        return patches, idxs
+    croppers = [RandomCrop3D(w, n_samples, threshold) for w in window]
+    centers = croppers[0].sample_centers(img, mask)
+    return [cropper(img, centers) for cropper in croppers]
 
 
 def random_locs(grid: Grid, idxs: List[Index]) -> List[Loc]:
@@ -138,9 +162,21 @@ def random_locs(grid: Grid, idxs: List[Index]) -> List[Loc]:
     return [np.array(_middle_loc(xyz)) for xyz in grids]
 
 
-def _random_data_locs_slices(img: Array, grid: Grid, **kwargs) -> DataLocSlice:
-    patches, idxs = random_patches(img, **kwargs)
-    samples = [p.flatten() for p in patches]
-    locs = random_locs(grid, idxs)
-    slices = middle_slices(patches)
-    return samples, locs, slices
+def _random_data_locs_slices(img: Array,
+                             windows: Sequence[int],
+                             features: Optional[Features] = None,
+                             mask: Optional[Array] = None,
+                             origin: Loc = (0, 0, 0),
+                             shape: Optional[Shape] = None,
+                             **kwargs) -> List[DataLocSlice]:
+    if mask is not None and not mask.any():
+        return [_empty_data_locs_slices(window, img.dtype, features) for window in windows]
+    out = []
+    for window, (patches, idxs) in zip(windows, random_patches(img, windows, mask=mask, **kwargs)):
+        samples = extract_features(patches, features)
+        centers = [(idx.i1 + window // 2, idx.j1 + window // 2, idx.k1 + window // 2) for idx in idxs]
+        centers = np.asarray(centers).reshape(-1, 3) + np.asarray(origin)
+        locs = voxel_locs(centers, img.shape[-3:] if shape is None else shape)
+        slices = middle_slices(patches)
+        out.append((samples, locs, slices))
+    return out
@@ -19,89 +19,156 @@ from typing import *
 
 from functools import partial
 
-import nibabel as nib
 import numpy as np
-from sklearn import preprocessing
 from tqdm import tqdm
 
 from nimanifold.types import *
 from nimanifold.data.csv import *
+from nimanifold.data.load import *
+from nimanifold.data.sample.features import Features
 from nimanifold.data.sample.random import (
     _random_data_locs_slices,
 )
 from nimanifold.data.sample.step import (
     _step_data_locs_slices,
-    create_step_grid
 )
 from nimanifold.data.sample.util import (
     _get_cmap,
-    create_grid,
-    project_dataset_to_sphere
+    project_dataset_to_sphere,
+    standardize
 )
 
 
 def get_samples(csv: DataFrame,
-                window: int = 40,
+                window: Union[int, Sequence[int]] = 40,
                 step: Optional[int] = None,
                 n_samples: Optional[int] = None,
                 threshold: Optional[float] = None,
                 to_sphere: bool = False,
                 random: bool = False,
-                progress: bool = True) -> Sample:
+                progress: bool = True,
+                n_prefetch: int = 2,
+                n_workers: int = 1,
+                max_prefetch_bytes: Optional[int] = None,
+                features: Optional[Features] = None,
+                dtype: Optional[DType] = np.float64,
+                slice_dtype: Optional[DType] = None,
+                mask_coverage: float = 0.5,
+                batch_size: int = 1024) -> Union[Sample, Dict[int, Sample]]:
+    """
+    sample patches from every image in `csv`; if `window` is a sequence of
+    window sizes, each image is loaded and thresholded once and a dict
+    mapping each window size to its Sample is returned, where patch centers
+    are aligned across window sizes where the image boundary allows.
+    `features` names registered feature extractors (or gives callables)
+    applied to each batch of patches in place of the raw voxels; duplicate
+    patches are only dropped when sampling raw voxels, since distinct
+    patches can share features.
+    volumes are loaded and sampled as `dtype` (their on-disk dtype if None)
+    and the Sample data and locs are `dtype` (float32 if None); slices are
+    `slice_dtype` (default same as data), e.g., float16.
+    if `csv` has a `mask` column, only the image voxels in the (padded)
+    bounding box of each mask are read; windows are then chosen by mask
+    coverage (at least `mask_coverage`) or centered on mask voxels
+    instead of by intensity
+    """
     patient_id_map = get_patient_id_map(csv)
     site_map = get_site_map(csv)
     contrast_map = get_contrast_map(csv)
     has_site = site_map is not None
     has_contrast = contrast_map is not None
-    grid_creator = create_grid if random else \
-        partial(create_step_grid, window=window, step=step)
-    if step is None:
-        step = window
-    if threshold is None:
-        threshold = float(window) / 4.
-    sample_kwargs = dict(n_samples=n_samples,
-                         step=step,
-                         threshold=threshold,
-                         window=window)
-    sampler = partial(_random_data_locs_slices, **sample_kwargs) if random else \
-        partial(_step_data_locs_slices, **sample_kwargs)
-    data, locs, pids, slices, sites, contrasts = [], [], [], [], [], []
-    grids = {}
-    rows = enumerate(csv.iterrows())
+    has_mask = 'mask' in csv.columns
+    windows = [window] if isinstance(window, int) else list(window)
+    steps = [w if step is None else step for w in windows]
+    thresholds = [float(w) / 4. if threshold is None else threshold for w in windows]
+    if random:
+        sampler = partial(_random_data_locs_slices,
+                          windows=windows,
+                          n_samples=n_samples,
+                          threshold=min(thresholds),
+                          features=features)
+    else:
+        sampler = partial(_step_data_locs_slices,
+                          windows=windows,
+                          steps=steps,
+                          thresholds=thresholds,
+                          features=features,
+                          mask_coverage=mask_coverage,
+                          batch_size=batch_size)
+    results = {w: ([], [], [], [], [], []) for w in windows}
+    out_dtype = np.float32 if dtype is None else dtype
+    slice_dtype = out_dtype if slice_dtype is None else slice_dtype
+    if has_mask:
+        load = partial(load_masked_volume, dtype=dtype, pad=max(windows) // 2)
+        imgs = prefetch(zip(csv.filename, csv['mask']), load, n_prefetch, n_workers, max_prefetch_bytes)
+    else:
+        load = partial(load_volume, dtype=dtype)
+        imgs = prefetch(csv.filename, load, n_prefetch, n_workers, max_prefetch_bytes)
+    rows = enumerate(zip(csv.iterrows(), imgs))
     if progress:
         rows = tqdm(rows, total=csv.shape[0])
-    for i, (_, row) in rows:
-        fn = row.filename
+    for i, ((_, row), img) in rows:
         pid = row.id
-        img = nib.load(fn).get_fdata()
-        shape = img.shape
-        if shape not in grids:
-            grid = grid_creator(shape)
-            grids = {shape: grid}
-        data_, locs_, slices_ = sampler(img, grids[shape])
-        N = len(data_)
-        data.append(np.asarray(data_))
-        locs.append(np.asarray(locs_))
-        slices.append(np.asarray(slices_))
-        pids.append(np.asarray([patient_id_map[pid]] * N))
-        if has_site:
-            site = row.site
-            sites.append(np.asarray([site_map[site]] * N))
-        if has_contrast:
-            contrast = row.contrast
-            contrasts.append(np.asarray([contrast_map[contrast]] * N))
+        img, mask, origin, shape = img if has_mask else (img, None, (0, 0, 0), None)
+        for w, (data_, locs_, slices_) in zip(windows, sampler(img, mask=mask, origin=origin, shape=shape)):
+            data, locs, pids, slices, sites, contrasts = results[w]
+            N = len(data_)
+            if N == 0:
+                continue
+            data.append(np.asarray(data_))
+            locs.append(np.asarray(locs_))
+            slices.append(np.asarray(slices_))
+            pids.append(np.asarray([patient_id_map[pid]] * N))
+            if has_site:
+                site = row.site
+                sites.append(np.asarray([site_map[site]] * N))
+            if has_contrast:
+                contrast = row.contrast
+                contrasts.append(np.asarray([contrast_map[contrast]] * N))
+    for w in windows:
+        if not results[w][0]:
+            raise ValueError(f'No windows of size {w} were sampled from any image; '
+                             'try a lower threshold or mask_coverage.')
+    samples = {w: _to_sample(*results[w], has_site, has_contrast, to_sphere, out_dtype, slice_dtype,
+                             dedupe=features is None)
+               for w in windows}
+    return samples[window] if isinstance(window, int) else samples
+
+
+def _to_sample(data: List[Array],
+               locs: List[Array],
+               pids: List[Array],
+               slices: List[Array],
+               sites: List[Array],
+               contrasts: List[Array],
+               has_site: bool,
+               has_contrast: bool,
+               to_sphere: bool,
+               dtype: DType = np.float64,
+               slice_dtype: DType = np.float64,
+               dedupe: bool = True) -> Sample:
     data = np.vstack(data)
-    data, idxs = np.unique(data, axis=0, return_index=True)
-    locs = np.vstack(locs)[idxs]
+    if dedupe:
+        data, idxs = np.unique(data, axis=0, return_index=True)
+    else:
+        idxs = slice(None)
+    data = data.astype(dtype, copy=False)
+    locs = np.vstack(locs)[idxs].astype(dtype, copy=False)
     locs = (locs - locs.min()) / (locs.max() - locs.min())
-    slices = np.vstack(slices)[idxs]
+    slices = np.vstack(slices)[idxs].astype(slice_dtype, copy=False)
     pids = np.concatenate(pids)[idxs]
+    sites = np.concatenate(sites)[idxs] if has_site else None
+    contrasts = np.concatenate(contrasts)[idxs] if has_contrast else None
+    ids = np.full((pids.size, 3), -1, dtype=np.int64)
+    for j, x in enumerate((pids, sites, contrasts)):
+        if x is not None:
+            ids[:, j] = x
     pids = _get_cmap(pids, 'gist_ncar')
-    sites = _get_cmap(np.concatenate(sites)[idxs]) if has_site else None
-    contrasts = _get_cmap(np.concatenate(contrasts)[idxs]) if has_contrast else None
+    sites = _get_cmap(sites) if has_site else None
+    contrasts = _get_cmap(contrasts) if has_contrast else None
     if to_sphere:
         data = project_dataset_to_sphere(data)
     else:
-        data = preprocessing.scale(data)
-    samples = Sample(data, locs, pids, slices, sites, contrasts)
+        data = standardize(data)
+    samples = Sample(data, locs, pids, slices, sites, contrasts, ids)
     return samples
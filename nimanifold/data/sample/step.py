@@ -12,8 +12,11 @@ Created on: Apr. 15, 2021
 
 __all__ = [
     'create_step_grid',
+    'integral_volume',
+    'iter_step_patches',
     'step_locs',
     'step_patches',
+    'window_sums',
 ]
 
 from typing import *
@@ -22,32 +25,99 @@ import numpy as np
 from skimage.util import view_as_windows
 
 from nimanifold.types import *
+from nimanifold.data.sample.features import Features, extract_features
 from nimanifold.data.sample.util import (
     create_grid,
     middle_slices,
+    voxel_locs,
+    _empty_data_locs_slices,
     _middle_loc
 )
 
 
-def create_step_grid(shape: Shape, window: int, step: int) -> Grid:
-    x, y, z = create_grid(shape)
+def create_step_grid(shape: Shape, window: int, step: int, dtype: DType = np.float64) -> Grid:
+    x, y, z = create_grid(shape, dtype)
     x = view_as_windows(x, window, step=step).reshape(-1, window, window, window)
     y = view_as_windows(y, window, step=step).reshape(-1, window, window, window)
     z = view_as_windows(z, window, step=step).reshape(-1, window, window, window)
     return x, y, z
 
 
-def step_patches(img: Array, window: int = 40, step: Optional[int] = None, threshold: float = 0.,
-                 **kwargs) -> Tuple[List[Array], List[int]]:
+def integral_volume(img: Array) -> Array:
+    """ zero-padded cumulative sum such that any box sum takes eight lookups """
+    ii = np.pad(img.astype(np.float64), ((1, 0), (1, 0), (1, 0)))
+    for axis in range(3):
+        np.cumsum(ii, axis=axis, out=ii)
+    return ii
+
+
+def window_sums(ii: Array, window: int, step: int, offset: int = 0) -> Array:
+    """ sum of every window in the grid of `view_as_windows(img[offset:, ...], window, step)` """
+    a1, b1, c1 = [np.arange(offset, s - window, step) for s in ii.shape]
+    a2, b2, c2 = a1 + window, b1 + window, c1 + window
+    return (ii[np.ix_(a2, b2, c2)] - ii[np.ix_(a1, b2, c2)] - ii[np.ix_(a2, b1, c2)] -
+            ii[np.ix_(a2, b2, c1)] + ii[np.ix_(a1, b1, c2)] + ii[np.ix_(a1, b2, c1)] +
+            ii[np.ix_(a2, b1, c1)] - ii[np.ix_(a1, b1, c1)])
+
+
+def iter_step_patches(img: Array,
+                      window: int = 40,
+                      step: Optional[int] = None,
+                      threshold: float = 0.,
+                      batch_size: int = 1024,
+                      offset: int = 0,
+                      ii: Optional[Array] = None) -> Iterator[Tuple[Array, Array]]:
+    """
+    yield batches of (patches, grid idxs) of the windows whose sum in `ii`
+    (default: of `img`) exceeds `threshold`; windows stay a strided view
+    of `img` and only accepted windows are copied, `batch_size` at a time,
+    so memory does not grow with the overlap between windows
+    """
     if step is None:
         step = window
-    patches, idxs = [], []
-    windows = view_as_windows(img, window, step=step).reshape(-1, window, window, window)
-    for i, w in enumerate(windows):
-        if w.sum() > threshold:
-            idxs.append(i)
-            patches.append(w)
-    return patches, idxs
+    if ii is None:
+        ii = integral_volume(img)
+    sums = window_sums(ii, window, step, offset)
+    grid_idxs = np.argwhere(sums > threshold)
+    if grid_idxs.shape[0] == 0:
+        return  # also avoids view_as_windows failing on an image smaller than the window
+    windows = view_as_windows(img[offset:, offset:, offset:], window, step=step)
+    for i in range(0, grid_idxs.shape[0], batch_size):
+        batch = grid_idxs[i:i + batch_size]
+        yield windows[batch[:, 0], batch[:, 1], batch[:, 2]], batch
+
+
+def _offsets(windows: Sequence[int]) -> List[int]:
+    """ offsets that put the first window center of every size at the same voxel """
+    w_max = max(windows)
+    return [w_max // 2 - w // 2 for w in windows]
+
+
+def step_patches(img: Array, window: Union[int, Sequence[int]] = 40, step: Optional[int] = None,
+                 threshold: Union[float, Sequence[float]] = 0., **kwargs) -> \
+        Union[Tuple[Array, List[int]], List[Tuple[Array, List[int]]]]:
+    """
+    extract windows whose sum exceeds `threshold`; if `window` is a sequence,
+    the foreground is computed once and a (patches, idxs) pair is returned for
+    each window size, where each grid is offset so window centers align
+    """
+    if isinstance(window, int):
+        windows, thresholds = [window], [threshold]
+    else:
+        windows = list(window)
+        thresholds = threshold if isinstance(threshold, Sequence) else [threshold] * len(windows)
+    ii = integral_volume(img)
+    out = []
+    for w, t, offset in zip(windows, thresholds, _offsets(windows)):
+        s = w if step is None else step
+        shape = [(n - offset - w) // s + 1 for n in img.shape]
+        patches, idxs = [], []
+        for p, grid_idxs in iter_step_patches(img, w, s, t, offset=offset, ii=ii):
+            patches.append(p)
+            idxs.extend(np.ravel_multi_index(tuple(grid_idxs.T), shape).tolist())
+        patches = np.concatenate(patches) if patches else np.empty((0, w, w, w), dtype=img.dtype)
+        out.append((patches, idxs))
+    return out[0] if isinstance(window, int) else out
 
 
 def step_locs(grid: Grid, idxs: Optional[List[int]] = None) -> List[Array]:
@@ -56,9 +126,37 @@ def step_locs(grid: Grid, idxs: Optional[List[int]] = None) -> List[Array]:
     return [np.array(_middle_loc(xyz)) for xyz in zip(*grid)]
 
 
-def _step_data_locs_slices(img: Array, grid: Grid, **kwargs) -> DataLocSlice:
-    patches, idxs = step_patches(img, **kwargs)
-    samples = [p.flatten() for p in patches]
-    locs = step_locs(grid, idxs)
-    slices = middle_slices(patches)
-    return samples, locs, slices
+def _step_data_locs_slices(img: Array,
+                           windows: Sequence[int],
+                           steps: Sequence[int],
+                           thresholds: Sequence[float],
+                           features: Optional[Features] = None,
+                           mask: Optional[Array] = None,
+                           mask_coverage: float = 0.5,
+                           origin: Loc = (0, 0, 0),
+                           shape: Optional[Shape] = None,
+                           batch_size: int = 1024,
+                           **kwargs) -> List[DataLocSlice]:
+    """
+    if `mask` is given, windows are kept when at least `mask_coverage` of their
+    voxels are in the mask (regardless of `thresholds`); `origin` and `shape`
+    place a cropped `img` in the full volume for the locs
+    """
+    ii = integral_volume(img if mask is None else mask)
+    if mask is not None:
+        # mask sums are integers, so this is sum >= mask_coverage * window ** 3
+        thresholds = [np.ceil(mask_coverage * w ** 3) - 1 for w in windows]
+    out = []
+    for window, step, threshold, offset in zip(windows, steps, thresholds, _offsets(windows)):
+        samples, locs, slices = [], [], []
+        for patches, grid_idxs in iter_step_patches(img, window, step, threshold, batch_size, offset, ii):
+            samples.append(extract_features(patches, features))
+            centers = grid_idxs * step + offset + window // 2 + np.asarray(origin)
+            locs.append(voxel_locs(centers, img.shape if shape is None else shape))
+            slices.append(np.asarray(middle_slices(patches)))  # copy so the batch can be freed
+        if samples:
+            out.append((np.concatenate(samples), np.concatenate(locs), np.concatenate(slices)))
+        else:
+            out.append(_empty_data_locs_slices(window, img.dtype, features))
+    return out
+
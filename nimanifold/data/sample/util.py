@@ -15,24 +15,39 @@ __all__ = [
     'middle',
     'middle_slices',
     'project_dataset_to_sphere',
-    'project_to_sphere'
+    'project_to_sphere',
+    'standardize',
+    'voxel_locs'
 ]
 
 from typing import *
 
-from matplotlib import cm
 import numpy as np
 
 from nimanifold.types import *
+from nimanifold.data.sample.features import Features, extract_features
 
 
-def create_grid(shape: Shape) -> Grid:
-    x = np.linspace(0, 1, shape[1])
-    y = np.linspace(0, 1, shape[0])
-    z = np.linspace(0, 1, shape[2])
+def create_grid(shape: Shape, dtype: DType = np.float64) -> Grid:
+    x = np.linspace(0, 1, shape[1], dtype=dtype)
+    y = np.linspace(0, 1, shape[0], dtype=dtype)
+    z = np.linspace(0, 1, shape[2], dtype=dtype)
     return np.meshgrid(x, y, z)
 
 
+def voxel_locs(centers: Array, shape: Shape, dtype: DType = np.float64) -> Array:
+    """ locations of voxel idxs (N x 3) in the grid from `create_grid(shape)` """
+    i, j, k = np.asarray(centers).T
+    scale = [max(s - 1, 1) for s in shape]
+    return np.stack([j / scale[1], i / scale[0], k / scale[2]], axis=1).astype(dtype, copy=False)
+
+
+def _empty_data_locs_slices(window: int, dtype: DType, features: Optional[Features] = None) -> DataLocSlice:
+    """ data (0 x F), locs (0 x 3), and slices (0 x w x w) for an image without any accepted windows """
+    data = extract_features(np.zeros((1, window, window, window), dtype=dtype), features)[:0]
+    return data, np.empty((0, 3)), np.empty((0, window, window), dtype=dtype)
+
+
 def middle_slices(patches: List[Array], axis: int = 2, n_rot: int = 3) -> List[Array]:
     shape = patches[0].shape
     if axis == 0:
@@ -71,5 +86,23 @@ def project_dataset_to_sphere(x: Array, axis: int = -1) -> Array:
     return x / np.linalg.norm(x)
 
 
+def standardize(x: Array, chunk_size: int = 65536) -> Array:
+    """ scale columns of `x` in place to zero mean and unit variance, accumulating in float64 """
+    N = x.shape[0]
+    mean = np.zeros(x.shape[1:])
+    for i in range(0, N, chunk_size):
+        mean += x[i:i + chunk_size].sum(axis=0, dtype=np.float64)
+    mean /= N
+    var = np.zeros(x.shape[1:])
+    for i in range(0, N, chunk_size):
+        var += ((x[i:i + chunk_size] - mean) ** 2).sum(axis=0)
+    std = np.sqrt(var / N)
+    std[std < 10 * np.finfo(np.float64).eps] = 1.
+    for i in range(0, N, chunk_size):
+        x[i:i + chunk_size] = (x[i:i + chunk_size] - mean) / std
+    return x
+
+
 def _get_cmap(data: Array, cmap: str = 'Spectral') -> Array:
+    from matplotlib import cm
     return cm.get_cmap(cmap, len(np.unique(data)))(data)[:, :3]
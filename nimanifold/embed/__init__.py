@@ -0,0 +1,9 @@
+from nimanifold.lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['pca'],
+    submod_attrs={
+        'pca': ['hdf5_chunks', 'pca_sample', 'StreamingPCA'],
+    }
+)
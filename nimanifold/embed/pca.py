@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+nimanifold.embed.pca
+
+out-of-core PCA of Sample data stored in HDF5 files
+
+Author: Jacob Reinhold (jcreinhold@gmail.com)
+
+Created on: Oct. 19, 2026
+"""
+
+__all__ = [
+    'hdf5_chunks',
+    'pca_sample',
+    'StreamingPCA'
+]
+
+from typing import *
+
+from functools import partial
+
+import h5py
+import numpy as np
+from sklearn.decomposition import IncrementalPCA
+
+from nimanifold.types import *
+from nimanifold.util import hdf5_chunk_rows
+
+CHUNK_BYTES = 2 ** 26
+
+
+def hdf5_chunks(filename: str, name: str = 'data', chunk_size: Optional[int] = None) -> Iterator[Array]:
+    """ iterate over blocks of rows of dataset `name` in an HDF5 file """
+    with h5py.File(filename, 'r') as f:
+        dataset = f[name]
+        if chunk_size is None:
+            chunk_size = hdf5_chunk_rows(dataset, CHUNK_BYTES)
+        for i in range(0, dataset.shape[0], chunk_size):
+            yield dataset[i:i + chunk_size]
+
+
+def _merge_small(chunks: Iterable[Array], n_min: int) -> Iterator[Array]:
+    """ merge chunks with fewer than `n_min` rows into the previous chunk """
+    prev = None
+    for chunk in chunks:
+        if prev is None:
+            prev = chunk
+        elif chunk.shape[0] < n_min or prev.shape[0] < n_min:
+            prev = np.concatenate((prev, chunk))
+        else:
+            yield prev
+            prev = chunk
+    if prev is not None:
+        yield prev
+
+
+class StreamingPCA:
+    """
+    PCA fit one block of rows at a time, either incrementally
+    (`sklearn.decomposition.IncrementalPCA`, one pass) or with a seeded
+    randomized SVD (3 + `n_iter` passes over the data)
+    """
+
+    def __init__(self,
+                 n_components: int = 50,
+                 randomized: bool = False,
+                 n_oversamples: int = 10,
+                 n_iter: int = 2,
+                 seed: Optional[int] = None,
+                 chunk_size: Optional[int] = None):
+        self.n_components = n_components
+        self.randomized = randomized
+        self.n_oversamples = n_oversamples
+        self.n_iter = n_iter
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.mean_ = None
+        self.components_ = None
+        self.explained_variance_ = None
+        self._ipca = None
+
+    def __repr__(self) -> str:
+        s = '{name}(n_components={n_components}, randomized={randomized})'
+        return s.format(name=self.__class__.__name__, **self.__dict__)
+
+    def partial_fit(self, X: Array) -> 'StreamingPCA':
+        if self.randomized:
+            raise ValueError('partial_fit is only available when randomized=False.')
+        if self._ipca is None:
+            self._ipca = IncrementalPCA(self.n_components)
+        self._ipca.partial_fit(X)
+        self.mean_ = self._ipca.mean_
+        self.components_ = self._ipca.components_
+        self.explained_variance_ = self._ipca.explained_variance_
+        return self
+
+    def fit(self, filename: str, name: str = 'data') -> 'StreamingPCA':
+        chunks = partial(hdf5_chunks, filename, name, self.chunk_size)
+        if self.randomized:
+            self._fit_randomized(chunks)
+        else:
+            for X in _merge_small(chunks(), self.n_components):
+                self.partial_fit(X)
+        return self
+
+    def _fit_randomized(self, chunks: Callable[[], Iterator[Array]]) -> None:
+        n, total = 0, 0.
+        for X in chunks():
+            n += X.shape[0]
+            total = total + X.sum(axis=0, dtype=np.float64)
+        mean = total / n
+        rng = np.random.default_rng(self.seed)
+        Q = rng.standard_normal((mean.size, self.n_components + self.n_oversamples))
+        for _ in range(self.n_iter + 1):
+            Z = np.zeros_like(Q)
+            for X in chunks():
+                Xc = X - mean
+                Z += Xc.T @ (Xc @ Q)
+            Q, _ = np.linalg.qr(Z)
+        C = np.zeros((Q.shape[1], Q.shape[1]))
+        for X in chunks():
+            Y = (X - mean) @ Q
+            C += Y.T @ Y
+        evals, evecs = np.linalg.eigh(C)
+        order = np.argsort(evals)[::-1][:self.n_components]
+        self.mean_ = mean
+        self.components_ = (Q @ evecs[:, order]).T
+        self.explained_variance_ = evals[order] / max(n - 1, 1)
+
+    def transform(self, X: Array) -> Array:
+        return (X - self.mean_) @ self.components_.T
+
+    def transform_hdf5(self, filename: str, name: str = 'data') -> Array:
+        """ project dataset `name` one block at a time """
+        with h5py.File(filename, 'r') as f:
+            N = f[name].shape[0]
+        out = np.empty((N, self.n_components))
+        i = 0
+        for X in hdf5_chunks(filename, name, self.chunk_size):
+            out[i:i + X.shape[0]] = self.transform(X)
+            i += X.shape[0]
+        return out
+
+
+def pca_sample(filename: str,
+               n_components: int = 50,
+               out_filename: Optional[str] = None,
+               **kwargs) -> Sample:
+    """
+    reduce the data of a Sample saved with `Sample.to_hdf5` to `n_components`
+    dimensions without loading it into memory; `kwargs` go to `StreamingPCA`
+    """
+    pca = StreamingPCA(n_components, **kwargs).fit(filename)
+    sample = Sample.from_hdf5(filename, data=pca.transform_hdf5(filename))
+    if out_filename is not None:
+        sample.to_hdf5(out_filename)
+    return sample
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+nimanifold.lazy
+
+load package attributes on first access so that importing
+nimanifold does not import its heavy dependencies
+
+Author: Jacob Reinhold (jcreinhold@gmail.com)
+
+Created on: Oct. 19, 2026
+"""
+
+__all__ = [
+    'attach'
+]
+
+from typing import *
+
+import importlib
+import sys
+
+
+def attach(package: str,
+           submodules: Sequence[str] = (),
+           submod_attrs: Optional[Dict[str, Sequence[str]]] = None,
+           subpackages: Sequence[str] = ()) -> Tuple[Callable, Callable, List[str]]:
+    """
+    create `__getattr__`, `__dir__`, and `__all__` for `package` where
+    `submod_attrs` maps a (relative) module name to the attributes it defines
+    and every name in the `__all__` of each of `subpackages` (themselves
+    lazy, so importing them is cheap) is re-exported, such that each export
+    is only declared once; attributes take precedence over submodules of the
+    same name, e.g., `__getattr__, __dir__, __all__ = attach(__name__, ['plot'], {'types': ['Sample']})`
+    """
+    attr_to_module = {attr: mod for mod, attrs in (submod_attrs or {}).items() for attr in attrs}
+    parent = sys.modules[package]
+    for subpackage in subpackages:
+        module = importlib.import_module(f'{package}.{subpackage}')
+        for attr in module.__all__:
+            attr_to_module.setdefault(attr, subpackage)
+    for subpackage in subpackages:
+        # importing a subpackage binds it on the parent, which would hide an attribute of the same name
+        if subpackage in attr_to_module:
+            delattr(parent, subpackage)
+    submodules = set(submodules) | set(subpackages)
+    names = sorted(submodules | set(attr_to_module))
+    public = sorted(attr_to_module)
+
+    def __getattr__(name: str) -> Any:
+        if name in attr_to_module:
+            module = importlib.import_module(f'{package}.{attr_to_module[name]}')
+            value = getattr(module, name)
+        elif name in submodules:
+            value = importlib.import_module(f'{package}.{name}')
+        else:
+            raise AttributeError(f'module {package} has no attribute {name}')
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return names
+
+    return __getattr__, __dir__, public
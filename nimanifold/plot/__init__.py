@@ -1 +1,9 @@
-from nimanifold.plot.generic import *
+from nimanifold.lazy import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=['generic'],
+    submod_attrs={
+        'generic': ['atlas_imgs', 'density_image', 'plot', 'save_pyramid', 'scatter_imgs', 'thumbnail_atlas'],
+    }
+)
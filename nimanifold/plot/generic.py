@@ -11,18 +11,25 @@ Created on: Apr. 15, 2021
 """
 
 __all__ = [
+    'atlas_imgs',
+    'density_image',
     'plot',
-    'scatter_imgs'
+    'save_pyramid',
+    'scatter_imgs',
+    'thumbnail_atlas'
 ]
 
 from typing import *
 
+import os
+
 from matplotlib import offsetbox
 import matplotlib.pyplot as plt
 import numpy as np
 from sklearn.preprocessing import minmax_scale
 
 from nimanifold.types import *
+from nimanifold.util import unique_rows
 
 TICK_PARAMS = dict(
     left=False,
@@ -41,21 +48,35 @@ def plot(samples: Sample,
          ax: Axes = None,
          title: str = None,
          scale: bool = True,
-         eps: float = 4e-3) -> None:
+         eps: float = 4e-3,
+         atlas: bool = False,
+         resolution: int = 1024,
+         aggregate: Optional[str] = None,
+         bins: int = 512) -> None:
     if colors is not None:
         colors = _get_color(samples, colors)
     data = samples.data
+    if aggregate is not None:
+        data = data[:, :2]
     if scale:
         data = minmax_scale(data)
     if ax is None:
         _, ax = plt.subplots(1, 1, figsize=(8, 8))
-    ax.scatter(data[:, 0], data[:, 1], c=colors, s=3.)
+    if aggregate is not None:
+        image, extent = density_image(data, colors, aggregate, bins)
+        ax.imshow(image, origin='lower', extent=extent, interpolation='nearest')
+    else:
+        ax.scatter(data[:, 0], data[:, 1], c=colors, s=3.)
     ax.set_facecolor("black")
     ax.axis('scaled')
     ax.xaxis.set_tick_params(**TICK_PARAMS)
     ax.yaxis.set_tick_params(**TICK_PARAMS)
     if samples.slices is not None:
-        scatter_imgs(data, samples.slices, ax, eps)
+        # one artist per thumbnail would make the aggregated plot O(N) again
+        if atlas or aggregate is not None:
+            atlas_imgs(data, samples.slices, ax, eps, resolution)
+        else:
+            scatter_imgs(data, samples.slices, ax, eps)
     if title is not None:
         plt.title(title)
 
@@ -74,3 +95,135 @@ def scatter_imgs(data: Array, slices: Array, ax: Axes, eps: float = 4e-3):
                 offsetbox.OffsetImage(slices[i], cmap=plt.cm.gray),
                 data[i])
             ax.add_artist(imagebox)
+
+
+def density_image(data: Array,
+                  colors: Optional[Array] = None,
+                  how: str = 'count',
+                  bins: int = 512,
+                  cmap: str = 'inferno') -> Tuple[Array, Tuple[float, float, float, float]]:
+    """
+    bin the embedded points into a `bins` x `bins` RGBA image (origin in the
+    lower-left corner) in one vectorized pass, coloring each pixel by the
+    log-count of points (`count`), or by the `mean` or `majority` of
+    `colors` (e.g., pids, sites, or contrasts); returns the image and
+    its extent in data coordinates
+    """
+    if how not in ('count', 'mean', 'majority'):
+        raise ValueError(f'how {how} invalid. needs to be one of count, mean, majority.')
+    xy = data[:, :2]
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    width = np.where(hi > lo, hi - lo, 1.)
+    ij = ((xy - lo) * (bins / width)).astype(np.intp)
+    np.clip(ij, 0, bins - 1, out=ij)
+    pix = ij[:, 1] * bins + ij[:, 0]
+    counts = np.bincount(pix, minlength=bins * bins)
+    image = np.zeros((bins * bins, 4))
+    if how == 'count' or colors is None:
+        density = np.log1p(counts)
+        image[:] = plt.get_cmap(cmap)(density / density.max())
+    elif how == 'mean':
+        for c in range(3):
+            image[:, c] = np.bincount(pix, weights=colors[:, c], minlength=bins * bins)
+        image[:, :3] /= np.maximum(counts, 1)[:, None]
+    else:
+        colors = np.asarray(colors[:, :3], dtype=np.float64)
+        first, labels = unique_rows(colors)
+        palette = colors[first]
+        n_labels = palette.shape[0]
+        keys, n = np.unique(pix * n_labels + labels, return_counts=True)
+        keys = keys[np.lexsort((n, keys // n_labels))]
+        kpix = keys // n_labels
+        best = keys[np.r_[kpix[1:] != kpix[:-1], True]]  # most frequent label is last per pixel
+        image[best // n_labels, :3] = palette[best % n_labels]
+    image[:, 3] = counts > 0
+    image = image.reshape(bins, bins, 4)
+    extent = (lo[0], lo[0] + width[0], lo[1], lo[1] + width[1])
+    return image, extent
+
+
+def _select_thumbnails(data: Array, eps: float = 4e-3) -> Array:
+    """ keep the first point in each sqrt(eps)-sized cell of the embedding """
+    cell = np.sqrt(eps)
+    cells = np.floor((data - data.min(axis=0)) / cell).astype(np.int64)
+    idxs, _ = unique_rows(cells)
+    return np.sort(idxs)
+
+
+def thumbnail_atlas(data: Array,
+                    slices: Array,
+                    eps: float = 4e-3,
+                    resolution: int = 1024) -> Tuple[Array, Tuple[float, float, float, float]]:
+    """
+    composite the thumbnails of well-separated points into one RGBA canvas
+    (origin in the lower-left corner) where `resolution` pixels span the
+    larger side of the embedding; returns the canvas and its extent
+    in data coordinates, e.g., for `ax.imshow(..., extent=extent)`
+    """
+    xy = data[:, :2]
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    span = (hi - lo).max()
+    span = span if span > 0. else 1.
+    pix = span / resolution
+    idxs = _select_thumbnails(xy, eps)
+    thumbs = np.asarray(slices[idxs], dtype=np.float32)
+    _, h, w = thumbs.shape
+    tmin = thumbs.min(axis=(1, 2), keepdims=True)
+    trange = thumbs.max(axis=(1, 2), keepdims=True) - tmin
+    thumbs = (thumbs - tmin) / np.where(trange > 0., trange, 1.)
+    size = np.ceil((hi - lo) / pix).astype(int) + 1
+    canvas = np.zeros((size[1] + h, size[0] + w, 4), dtype=np.float32)
+    px = np.round((xy[idxs] - lo) / pix).astype(int)
+    rows = px[:, 1, None, None] + np.arange(h)[None, :, None]
+    cols = px[:, 0, None, None] + np.arange(w)[None, None, :]
+    canvas[rows, cols, :3] = thumbs[:, ::-1, :, None]  # flip rows for origin='lower'
+    canvas[rows, cols, 3] = 1.
+    left = lo[0] - (w // 2) * pix
+    bottom = lo[1] - (h // 2) * pix
+    extent = (left, left + canvas.shape[1] * pix, bottom, bottom + canvas.shape[0] * pix)
+    return canvas, extent
+
+
+def atlas_imgs(data: Array, slices: Array, ax: Axes, eps: float = 4e-3, resolution: int = 1024) -> Array:
+    """ draw thumbnails as a single image instead of one artist per thumbnail """
+    canvas, extent = thumbnail_atlas(data, slices, eps, resolution)
+    xlim, ylim = ax.get_xlim(), ax.get_ylim()
+    ax.imshow(canvas, origin='lower', extent=extent, interpolation='nearest', zorder=3)
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+    return canvas
+
+
+def _downsample(canvas: Array) -> Array:
+    """ halve an RGBA canvas, averaging premultiplied colors so transparent pixels don't darken edges """
+    h, w = canvas.shape[:2]
+    canvas = np.pad(canvas, ((0, h % 2), (0, w % 2), (0, 0)), mode='edge')
+    canvas = np.concatenate((canvas[..., :3] * canvas[..., 3:], canvas[..., 3:]), axis=-1)
+    out = 0.25 * (canvas[::2, ::2] + canvas[1::2, ::2] + canvas[::2, 1::2] + canvas[1::2, 1::2])
+    alpha = out[..., 3:]
+    out[..., :3] /= np.where(alpha > 0., alpha, 1.)
+    return out
+
+
+def save_pyramid(canvas: Array, path: str, tile_size: int = 256) -> int:
+    """
+    save a canvas from `thumbnail_atlas` as a tiled image pyramid for
+    zoomable viewing, i.e., `path/{level}/{row}_{col}.png` where level 0
+    is full resolution and each level halves the previous one until the
+    whole canvas fits in one tile; returns the number of levels
+    """
+    level = 0
+    image = canvas[::-1]  # image files have their origin in the upper-left corner
+    while True:
+        dirname = os.path.join(path, str(level))
+        os.makedirs(dirname, exist_ok=True)
+        h, w = image.shape[:2]
+        for i in range(0, h, tile_size):
+            for j in range(0, w, tile_size):
+                tile = np.clip(image[i:i + tile_size, j:j + tile_size], 0., 1.)
+                fn = os.path.join(dirname, f'{i // tile_size}_{j // tile_size}.png')
+                plt.imsave(fn, tile)
+        level += 1
+        if h <= tile_size and w <= tile_size:
+            return level
+        image = _downsample(image)
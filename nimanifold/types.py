@@ -15,10 +15,14 @@ __all__ = [
     'Axes',
     'DataFrame',
     'DataLocSlice',
+    'DType',
     'Grid',
     'Loc',
     'Number',
     'Sample',
+    'SampleView',
+    'Seed',
+    'Selection',
     'Shape',
     'SubGrid'
 ]
@@ -27,35 +31,55 @@ from typing import *
 
 from copy import copy
 
-import h5py
-from matplotlib.axes import Axes
 import numpy as np
-import pandas as pd
+
+from nimanifold.util import unique_rows
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from pandas import DataFrame
+else:
+    # forward references, so importing this module doesn't import matplotlib or pandas
+    Axes = 'matplotlib.axes.Axes'
+    DataFrame = 'pandas.DataFrame'
 
 Array = np.ndarray
-DataFrame = pd.DataFrame
+DType = Union[str, type, np.dtype]
 DataLocSlice = Tuple[List[Array], List[Array], List[Array]]
 Grid = Tuple[Array, Array, Array]
 Loc = Tuple[int, int, int]
 Number = Union[int, float]
+Seed = Optional[Union[int, np.random.Generator]]
+Selection = Union[Array, slice, Sequence[int], Sequence[bool], int]
 Shape = Tuple[int, int, int]
 SubGrid = Tuple[Array, Array, Array]
 
 
 class Sample:
+    """
+    embedded (or feature) `data` of sampled patches with their `locs`,
+    middle `slices`, and the colors of their `pids`, `sites`, and
+    `contrasts` for plotting; `ids` holds the integer patient, site, and
+    contrast id of each row (-1 if absent), i.e., the values of the csv
+    maps (`get_patient_id_map`, etc.) used when sampling
+    """
+    ID_FIELDS = ('pids', 'sites', 'contrasts')
+
     def __init__(self,
                  data: Array,
                  locs: Array,
                  pids: Array,
                  slices: Array,
                  sites: Optional[Array] = None,
-                 contrasts: Optional[Array] = None):
+                 contrasts: Optional[Array] = None,
+                 ids: Optional[Array] = None):
         self.data = data
         self.locs = locs
         self.pids = pids
         self.slices = slices
         self.sites = sites
         self.contrasts = contrasts
+        self.ids = ids
         self.is_valid()
 
     def __len__(self):
@@ -77,6 +101,9 @@ class Sample:
         if self.contrasts is not None:
             assert (self.contrasts.shape[0] == N)
             assert (self.contrasts.shape[1] == 3)
+        if self.ids is not None:
+            assert (self.ids.shape[0] == N)
+            assert (self.ids.shape[1] == len(self.ID_FIELDS))
 
     def new_data(self, data: Array):
         sample = copy(self)
@@ -84,38 +111,178 @@ class Sample:
         sample.is_valid()
         return sample
 
-    def subsample(self, n: int):
+    def __getitem__(self, idxs: Selection) -> 'Sample':
+        return self.select(idxs)
+
+    def select(self, idxs: Selection) -> 'Sample':
+        """ select rows by boolean mask, slice, or indices without copying """
+        return SampleView(self, idxs)
+
+    def labels(self, attr: str) -> Array:
+        """
+        integer id of each row's `attr` (pids, sites, or contrasts); if the
+        Sample has no `ids`, the rank of each row's color, which only groups
+        rows and does not match the csv's ids
+        """
+        colors = getattr(self, attr)
+        if colors is None:
+            raise ValueError(f'Sample does not have {attr}.')
+        if self.ids is not None:
+            return self.ids[:, self.ID_FIELDS.index(attr)]
+        _, codes = unique_rows(colors)
+        return codes
+
+    def filter(self,
+               pids: Optional[Sequence[int]] = None,
+               sites: Optional[Sequence[int]] = None,
+               contrasts: Optional[Sequence[int]] = None,
+               lo: Optional[Sequence[float]] = None,
+               hi: Optional[Sequence[float]] = None) -> 'Sample':
+        """ select rows whose patient, site, and contrast ids and locs are within those given """
+        if self.ids is None and (pids is not None or sites is not None or contrasts is not None):
+            raise ValueError('Sample does not have ids to filter by.')
+        mask = np.ones(len(self), dtype=bool)
+        for attr, codes in (('pids', pids), ('sites', sites), ('contrasts', contrasts)):
+            if codes is not None:
+                mask &= np.isin(self.labels(attr), codes)
+        if lo is not None:
+            mask &= np.all(self.locs >= np.asarray(lo), axis=1)
+        if hi is not None:
+            mask &= np.all(self.locs <= np.asarray(hi), axis=1)
+        return self.select(mask)
+
+    def subsample(self, n: int, seed: Seed = None) -> 'Sample':
         N = len(self)
         assert (n <= N)
-        idxs = np.random.choice(N, size=n, replace=False)
-        sample = Sample(
-            self.data[idxs],
-            self.locs[idxs],
-            self.pids[idxs],
-            self.slices[idxs],
-            self.sites[idxs] if self.sites is not None else None,
-            self.contrasts[idxs] if self.contrasts is not None else None,
-        )
+        rng = np.random.default_rng(seed)
+        idxs = rng.choice(N, size=n, replace=False)
+        return self.select(idxs)
+
+    def stratified(self, n: int, by: str = 'sites', seed: Seed = None) -> 'Sample':
+        """ subsample up to `n` rows from each group of `by` (pids, sites, or contrasts) """
+        rng = np.random.default_rng(seed)
+        codes = self.labels(by)
+        order = np.argsort(codes, kind='stable')
+        groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1)
+        idxs = [rng.choice(g, size=min(n, g.size), replace=False) for g in groups]
+        return self.select(np.sort(np.concatenate(idxs)))
+
+    def materialize(self) -> 'Sample':
+        return Sample(self.data, self.locs, self.pids, self.slices, self.sites, self.contrasts, self.ids)
+
+    def astype(self, dtype: DType, slice_dtype: Optional[DType] = None) -> 'Sample':
+        """ cast data and locs to `dtype` and slices to `slice_dtype` (default `dtype`) """
+        slice_dtype = dtype if slice_dtype is None else slice_dtype
+        sample = copy(self)
+        sample.data = self.data.astype(dtype, copy=False)
+        sample.locs = self.locs.astype(dtype, copy=False)
+        sample.slices = self.slices.astype(slice_dtype, copy=False)
         return sample
 
-    def to_hdf5(self, filename: str):
+    def to_hdf5(self, filename: str, dtype: Optional[DType] = None, slice_dtype: Optional[DType] = None):
+        """ save the Sample, optionally storing data and locs as `dtype` and slices as `slice_dtype` """
+        import h5py
+        slice_dtype = dtype if slice_dtype is None else slice_dtype
         with h5py.File(filename, "w") as f:
-            f.create_dataset('data', data=self.data)
-            f.create_dataset('locs', data=self.locs)
+            f.create_dataset('data', data=self.data, dtype=dtype)
+            f.create_dataset('locs', data=self.locs, dtype=dtype)
             f.create_dataset('pids', data=self.pids)
-            f.create_dataset('slices', data=self.slices)
+            f.create_dataset('slices', data=self.slices, dtype=slice_dtype)
             if self.sites is not None:
                 f.create_dataset('sites', data=self.sites)
             if self.contrasts is not None:
                 f.create_dataset('contrasts', data=self.contrasts)
+            if self.ids is not None:
+                f.create_dataset('ids', data=self.ids)
 
     @classmethod
-    def from_hdf5(cls, filename: str):
+    def from_hdf5(cls, filename: str, data: Optional[Array] = None):
+        """ load a Sample, using `data` in place of the stored data if given """
+        import h5py
         with h5py.File(filename, "r") as f:
-            data = np.asarray(f['data'])
+            data = np.asarray(f['data']) if data is None else data
             locs = np.asarray(f['locs'])
             pids = np.asarray(f['pids'])
             slices = np.asarray(f['slices'])
             sites = np.asarray(f['sites']) if 'sites' in f else None
             contrasts = np.asarray(f['contrasts']) if 'contrasts' in f else None
-        return cls(data, locs, pids, slices, sites, contrasts)
+            ids = np.asarray(f['ids']) if 'ids' in f else None
+        return cls(data, locs, pids, slices, sites, contrasts, ids)
+
+
+def _normalize_selection(idxs: Selection, N: int) -> Union[Array, slice]:
+    if isinstance(idxs, slice):
+        return idxs
+    idxs = np.atleast_1d(np.asarray(idxs))
+    if idxs.dtype == bool:
+        assert (idxs.shape == (N,))
+        return np.flatnonzero(idxs)
+    return idxs.astype(np.intp, copy=False)
+
+
+def _compose_selection(outer: Union[Array, slice], inner: Union[Array, slice], N: int) -> Union[Array, slice]:
+    """ selection into the base Sample equivalent to `inner` applied after `outer` """
+    if not isinstance(outer, slice):
+        return outer[inner]
+    r = range(N)[outer]
+    if isinstance(inner, slice):
+        r = r[inner]
+        return slice(r.start, r.stop if r.stop >= 0 else None, r.step)
+    return np.arange(r.start, r.stop, r.step)[inner]
+
+
+def _view_field(name: str) -> property:
+    def fget(self):
+        if name not in self._cache:
+            x = getattr(self._parent, name)
+            self._cache[name] = None if x is None else x[self._idxs]
+        return self._cache[name]
+
+    def fset(self, value):
+        self._cache[name] = value
+        self._written.add(name)
+
+    return property(fget, fset)
+
+
+class SampleView(Sample):
+    """
+    rows of a parent Sample, gathered from the parent only when an
+    attribute is first accessed; attributes set on the view are stored
+    on the view and never written through to the parent
+    """
+    data = _view_field('data')
+    locs = _view_field('locs')
+    pids = _view_field('pids')
+    slices = _view_field('slices')
+    sites = _view_field('sites')
+    contrasts = _view_field('contrasts')
+    ids = _view_field('ids')
+
+    def __init__(self, parent: Sample, idxs: Selection):
+        N = len(parent)
+        idxs = _normalize_selection(idxs, N)
+        if isinstance(parent, SampleView) and not parent._written:
+            idxs = _compose_selection(parent._idxs, idxs, len(parent._parent))
+            parent = parent._parent
+            N = len(parent)
+        self._parent = parent
+        self._idxs = idxs
+        self._len = len(range(N)[idxs]) if isinstance(idxs, slice) else idxs.size
+        self._cache = {}
+        self._written = set()
+
+    def __len__(self):
+        return self._len
+
+    def __copy__(self):
+        view = SampleView.__new__(SampleView)
+        view.__dict__.update(self.__dict__)
+        view._cache = dict(self._cache)
+        view._written = set(self._written)
+        return view
+
+    def is_valid(self):
+        for name in self._written:
+            x = self._cache[name]
+            assert (x is None or x.shape[0] == len(self))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+nimanifold.util
+
+array and HDF5 helpers shared across nimanifold
+
+Author: Jacob Reinhold (jcreinhold@gmail.com)
+
+Created on: Oct. 19, 2026
+"""
+
+__all__ = [
+    'hdf5_chunk_rows',
+    'unique_rows'
+]
+
+from typing import *
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from h5py import Dataset
+else:
+    Dataset = 'h5py.Dataset'
+
+
+def hdf5_chunk_rows(dataset: Dataset, nbytes: int) -> int:
+    """ number of rows in about `nbytes`, aligned to the dataset's chunks """
+    row_bytes = dataset.dtype.itemsize * int(np.prod(dataset.shape[1:]))
+    n = max(nbytes // max(row_bytes, 1), 1)
+    if dataset.chunks is not None:
+        n = max(n // dataset.chunks[0], 1) * dataset.chunks[0]
+    return n
+
+
+def unique_rows(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    index of the first occurrence of each unique row of `x` and the integer
+    code of every row, i.e., `np.unique(x, axis=0, return_index=True,
+    return_inverse=True)[1:]` but much faster since each row is compared
+    as one opaque (void) scalar; codes are ranks of the rows' bytes
+    """
+    x = np.ascontiguousarray(x).reshape(len(x), -1)
+    rows = x.view(np.dtype((np.void, x.itemsize * x.shape[1]))).ravel()
+    _, first, codes = np.unique(rows, return_index=True, return_inverse=True)
+    return first, codes.ravel()
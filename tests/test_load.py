@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""Tests for `nimanifold.data.load`."""
+
+import gzip
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import nibabel as nib
+import numpy as np
+
+from nimanifold.data import load
+
+
+class TestLoadVolume(unittest.TestCase):
+    """Tests for `load_volume`."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.img = np.random.default_rng(0).random((5, 6, 7))
+        self.fast_gzip = load.fast_gzip
+        load.fast_gzip = gzip  # stand-in for a faster gzip backend
+
+    def tearDown(self):
+        load.fast_gzip = self.fast_gzip
+        self.dir.cleanup()
+
+    def test_nifti1_and_nifti2_gzip(self):
+        """Test both NIfTI versions load through the gzip backend."""
+        for klass in (nib.Nifti1Image, nib.Nifti2Image):
+            fn = os.path.join(self.dir.name, f'{klass.__name__}.nii.gz')
+            nib.save(klass(self.img, np.eye(4)), fn)
+            np.testing.assert_allclose(load.load_volume(fn), self.img)
+
+
+class TestPrefetch(unittest.TestCase):
+    """Tests for `prefetch`."""
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.started = 0
+
+    def _load(self, i):
+        with self.lock:
+            self.started += 1
+        time.sleep(0.01)
+        if i == 'fail':
+            raise RuntimeError(i)
+        return np.full(125, i, dtype=np.float64)  # 1000 bytes
+
+    def test_order(self):
+        """Test items come back in order whichever thread loads them."""
+        out = [x[0] for x in load.prefetch(range(20), self._load, n_ahead=4, n_workers=4)]
+        self.assertEqual(out, list(range(20)))
+
+    def test_max_bytes(self):
+        """Test no more items are buffered than fit in `max_bytes`, even before the first loads."""
+        in_flight = []
+        for i, x in enumerate(load.prefetch(range(10), self._load, n_ahead=4, n_workers=4, max_bytes=2500)):
+            time.sleep(0.03)  # let the workers finish whatever was submitted
+            with self.lock:
+                in_flight.append(self.started - i)
+            self.assertEqual(x[0], i)
+        self.assertEqual(in_flight[0], 1)
+        self.assertLessEqual(max(in_flight), 3)  # the current item and two buffered ones
+
+    def test_exception(self):
+        """Test a failed load is raised when its item is reached."""
+        out = []
+        with self.assertRaises(RuntimeError):
+            for x in load.prefetch([0, 1, 'fail', 3], self._load, n_ahead=3, n_workers=2):
+                out.append(x[0])
+        self.assertEqual(out, [0, 1])
+
+
+class TestLoadMaskedVolume(unittest.TestCase):
+    """Tests for `load_masked_volume`."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _save(self, name, x):
+        fn = os.path.join(self.dir.name, name)
+        nib.save(nib.Nifti1Image(x, np.eye(4)), fn)
+        return fn
+
+    def test_crop(self):
+        """Test only the padded bounding box of the mask is returned."""
+        img = np.random.default_rng(0).random((20, 20, 20))
+        mask = np.zeros(img.shape, dtype=np.uint8)
+        mask[5:10, 6:8, 3:4] = 1
+        fns = self._save('img.nii.gz', img), self._save('mask.nii.gz', mask)
+        crop, crop_mask, origin, shape = load.load_masked_volume(fns, pad=2)
+        np.testing.assert_allclose(crop, img[3:12, 4:10, 1:6])
+        np.testing.assert_array_equal(crop_mask, mask[3:12, 4:10, 1:6] > 0)
+        self.assertEqual((origin, shape), ((3, 4, 1), (20, 20, 20)))
+
+    def test_shape_mismatch(self):
+        """Test a mask whose shape differs from the image's is rejected."""
+        fns = self._save('img.nii.gz', np.ones((24, 24, 24))), self._save('mask.nii.gz', np.ones((20, 20, 20)))
+        with self.assertRaisesRegex(ValueError, 'mask.nii.gz'):
+            load.load_masked_volume(fns)
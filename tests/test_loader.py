@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""Tests for `nimanifold.data.loader`."""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import h5py
+import numpy as np
+
+from nimanifold.data.loader import BatchLoader
+from nimanifold.types import Sample
+
+
+class TestBatchLoader(unittest.TestCase):
+    """Tests for `BatchLoader`."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filenames = []
+        self.n = (600, 300)
+        for i, n in enumerate(self.n):
+            rows = np.arange(n) + 1000 * i
+            sites = np.eye(3)[rows % 3]
+            ids = np.column_stack((np.full(n, i), rows % 3, np.zeros(n, dtype=int)))
+            data = np.column_stack((rows, rows)).astype(np.float64)
+            sample = Sample(data, np.zeros((n, 3)), np.zeros((n, 3)), np.zeros((n, 2, 2)), sites, ids=ids)
+            self.filenames.append(os.path.join(self.dir.name, f'sample{i}.h5'))
+            sample.to_hdf5(self.filenames[-1])
+        self.rows = np.r_[np.arange(self.n[0]), np.arange(self.n[1]) + 1000]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _rows(self, loader):
+        return [batch['data'][:, 0].copy() for batch in loader]
+
+    def test_epoch_covers_every_row(self):
+        """Test each epoch yields every row once in a new order."""
+        loader = BatchLoader(self.filenames, batch_size=64, block_size=50, buffer_blocks=3, seed=0)
+        epochs = [np.concatenate(self._rows(loader)) for _ in range(2)]
+        self.assertEqual(len(loader), -(-sum(self.n) // 64))
+        for rows in epochs:
+            np.testing.assert_array_equal(np.sort(rows), self.rows)
+        self.assertFalse(np.array_equal(epochs[0], epochs[1]))
+        self.assertFalse(np.array_equal(epochs[0], self.rows))
+
+    def test_order_without_shuffle(self):
+        """Test rows come in file order without shuffling, with the last batch dropped if asked."""
+        loader = BatchLoader(self.filenames, batch_size=64, shuffle=False, block_size=50, buffer_blocks=3)
+        np.testing.assert_array_equal(np.concatenate(self._rows(loader)), self.rows)
+        loader = BatchLoader(self.filenames, batch_size=64, shuffle=False, drop_last=True, block_size=50)
+        batches = self._rows(loader)
+        self.assertEqual(len(batches), len(loader))
+        self.assertTrue(all(len(b) == 64 for b in batches))
+        np.testing.assert_array_equal(np.concatenate(batches), self.rows[:len(loader) * 64])
+
+    def test_stratified_batches_are_balanced(self):
+        """Test stratified batches hold as many rows of each site."""
+        for stratify in ('sites', 'ids'):
+            # every block, and so every buffer of 300 rows, holds as many rows of each site
+            loader = BatchLoader(self.filenames, batch_size=30, stratify=stratify, block_size=60,
+                                 buffer_blocks=5, seed=0)
+            for batch in loader:
+                np.testing.assert_array_equal(batch['sites'].sum(axis=0), [10, 10, 10])
+
+    def test_buffer_opens_each_file_once(self):
+        """Test the blocks of a buffer are read with one open per file."""
+        loader = BatchLoader(self.filenames, shuffle=False, block_size=50)
+        with mock.patch.object(h5py, 'File', wraps=h5py.File) as File:
+            buffer = loader._read_buffer([(1, 50, 100), (0, 0, 50), (1, 0, 50), (0, 100, 150)])
+        opened = [args[0] for args, _ in File.call_args_list]
+        self.assertEqual(opened, self.filenames)
+        np.testing.assert_array_equal(buffer['data'][:, 0], np.r_[0:50, 100:150, 1000:1100])
+
@@ -3,10 +3,15 @@
 """Tests for `nimanifold` package."""
 
 
+import subprocess
+import sys
 import unittest
 
+import nimanifold
 from nimanifold import *
 
+HEAVY_MODULES = ('h5py', 'matplotlib', 'nibabel', 'pandas', 'skimage', 'sklearn', 'tqdm')
+
 
 class TestNimanifold(unittest.TestCase):
     """Tests for `nimanifold` package."""
@@ -19,3 +24,26 @@ class TestNimanifold(unittest.TestCase):
 
     def test_000_something(self):
         """Test something."""
+
+    def test_import_is_lazy(self):
+        """Test importing the package does not import heavy dependencies."""
+        code = ('import sys, nimanifold, nimanifold.types; '
+                f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+        out = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True)
+        self.assertEqual(out.stdout.decode().strip(), '')
+
+    def test_lazy_attributes(self):
+        """Test every exported name resolves."""
+        for name in nimanifold.__all__:
+            self.assertIsNotNone(getattr(nimanifold, name))
+
+    def test_subpackage_exports(self):
+        """Test the package re-exports its subpackages' exports, functions over modules."""
+        import nimanifold.data
+        import nimanifold.embed
+        import nimanifold.plot.generic
+        expected = {'Sample'}
+        for subpackage in (nimanifold.data, nimanifold.embed, sys.modules['nimanifold.plot']):
+            expected.update(subpackage.__all__)
+        self.assertEqual(set(nimanifold.__all__), expected)
+        self.assertIs(nimanifold.plot, sys.modules['nimanifold.plot.generic'].plot)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+"""Tests for `nimanifold.embed.pca`."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.decomposition import PCA
+
+from nimanifold.embed.pca import StreamingPCA, pca_sample
+from nimanifold.types import Sample
+
+
+class TestStreamingPCA(unittest.TestCase):
+    """Tests for `StreamingPCA` against `sklearn.decomposition.PCA`."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'sample.h5')
+        rng = np.random.default_rng(0)
+        N, F = 2000, 40
+        scales = np.r_[np.arange(5, 0, -1) * 3., np.full(F - 5, 0.1)]  # clear gap after 5 components
+        basis, _ = np.linalg.qr(rng.standard_normal((F, F)))
+        self.X = (rng.standard_normal((N, F)) * scales) @ basis.T + 2.
+        Sample(self.X, rng.random((N, 3)), rng.random((N, 3)), rng.random((N, 2, 2))).to_hdf5(self.filename)
+        self.pca = PCA(5).fit(self.X)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _check(self, pca):
+        np.testing.assert_allclose(pca.mean_, self.pca.mean_, atol=1e-10)
+        np.testing.assert_allclose(pca.explained_variance_, self.pca.explained_variance_, rtol=1e-2)
+        # components are only defined up to sign
+        cos = np.abs(np.sum(pca.components_ * self.pca.components_, axis=1))
+        np.testing.assert_allclose(cos, 1., atol=1e-3)
+
+    def test_incremental(self):
+        """Test the incremental fit matches PCA."""
+        self._check(StreamingPCA(5, chunk_size=301).fit(self.filename))
+
+    def test_randomized(self):
+        """Test the randomized fit matches PCA."""
+        self._check(StreamingPCA(5, randomized=True, seed=0, chunk_size=301).fit(self.filename))
+
+    def test_pca_sample(self):
+        """Test the reduced Sample matches PCA up to the sign of each component."""
+        for randomized in (False, True):
+            sample = pca_sample(self.filename, 5, randomized=randomized, seed=0, chunk_size=256)
+            expected = self.pca.transform(self.X)
+            signs = np.sign(np.sum(sample.data * expected, axis=0))
+            np.testing.assert_allclose(sample.data * signs, expected, atol=0.05 * expected.std())
+            self.assertEqual(len(sample), self.X.shape[0])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""Tests for `nimanifold.plot.generic`."""
+
+import os
+import tempfile
+import unittest
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib import offsetbox
+
+from nimanifold.plot.generic import (
+    _downsample,
+    _select_thumbnails,
+    density_image,
+    plot,
+    save_pyramid,
+    thumbnail_atlas
+)
+from nimanifold.types import Sample
+
+RED, GREEN, BLUE = np.eye(3)
+
+
+class TestDensityImage(unittest.TestCase):
+    """Tests for `density_image` on a 2 x 2 grid."""
+
+    def setUp(self):
+        # pixels (row, col) with origin='lower': (0, 0) has 3 points, (0, 1) has 1, (1, 0) none, (1, 1) has 2
+        self.data = np.array([[0., 0.], [0.1, 0.2], [0.2, 0.1], [0.9, 0.1], [1., 1.], [0.8, 0.9]])
+        self.colors = np.array([RED, BLUE, RED, GREEN, BLUE, BLUE])
+
+    def test_count(self):
+        """Test empty pixels are transparent and the densest pixel is brightest."""
+        image, extent = density_image(self.data, bins=2)
+        self.assertEqual(image.shape, (2, 2, 4))
+        np.testing.assert_array_equal(image[..., 3], [[1., 1.], [0., 1.]])
+        np.testing.assert_allclose(image[0, 0], plt.get_cmap('inferno')(1.))
+        np.testing.assert_allclose(extent, (0., 1., 0., 1.))
+
+    def test_mean(self):
+        """Test each channel is averaged over the points in a pixel."""
+        image, _ = density_image(self.data, self.colors, 'mean', bins=2)
+        np.testing.assert_allclose(image[0, 0, :3], (2 / 3, 0., 1 / 3))
+        np.testing.assert_allclose(image[0, 1, :3], GREEN)
+        np.testing.assert_allclose(image[1, 1, :3], BLUE)
+        np.testing.assert_array_equal(image[1, 0], 0.)
+
+    def test_majority(self):
+        """Test each pixel takes the most frequent color of its points."""
+        image, _ = density_image(self.data, self.colors, 'majority', bins=2)
+        np.testing.assert_array_equal(image[0, 0], (*RED, 1.))
+        np.testing.assert_array_equal(image[0, 1], (*GREEN, 1.))
+        np.testing.assert_array_equal(image[1, 1], (*BLUE, 1.))
+        np.testing.assert_array_equal(image[1, 0], 0.)
+
+    def test_invalid(self):
+        """Test an unknown aggregation is rejected."""
+        with self.assertRaises(ValueError):
+            density_image(self.data, self.colors, 'median')
+
+    def test_plot_aggregate(self):
+        """Test the aggregated plot draws the density and thumbnails as two images, not one artist per point."""
+        rng = np.random.default_rng(0)
+        N = 500
+        sites = np.eye(3)[rng.integers(0, 3, N)]
+        sample = Sample(rng.random((N, 2)), rng.random((N, 3)), sites, rng.random((N, 4, 4)), sites=sites)
+        _, ax = plt.subplots()
+        try:
+            plot(sample, colors='sites', ax=ax, aggregate='majority', bins=16)
+            self.assertEqual(len(ax.images), 2)
+            self.assertFalse(any(isinstance(a, offsetbox.AnnotationBbox) for a in ax.get_children()))
+            self.assertEqual(ax.images[0].get_array().shape, (16, 16, 4))
+        finally:
+            plt.close('all')
+
+
+class TestAtlas(unittest.TestCase):
+    """Tests for the thumbnail atlas and its image pyramid."""
+
+    def test_select_thumbnails(self):
+        """Test the first point of each sqrt(eps)-sized cell is kept."""
+        data = np.array([[0., 0.], [0.05, 0.05], [0.5, 0.5], [0.55, 0.52], [0.05, 0.52]])
+        np.testing.assert_array_equal(_select_thumbnails(data, eps=0.01), [0, 2, 4])
+
+    def test_thumbnail_atlas(self):
+        """Test each thumbnail is centered on its point and the extent matches the canvas."""
+        data = np.array([[0., 0.], [1., 0.5]])
+        slices = np.arange(18, dtype=np.float64).reshape(2, 3, 3)
+        canvas, extent = thumbnail_atlas(data, slices, eps=0.01, resolution=10)
+        pix = 0.1
+        self.assertEqual(canvas.shape, (6 + 3, 11 + 3, 4))
+        np.testing.assert_allclose(extent, (-pix, -pix + 14 * pix, -pix, -pix + 9 * pix))
+        self.assertEqual(canvas[..., 3].sum(), 2 * 9)
+        for (x, y), thumb in zip(data, slices):
+            col = int(round((x - extent[0]) / pix)) - 1
+            row = int(round((y - extent[2]) / pix)) - 1
+            self.assertTrue(extent[0] + col * pix < x < extent[0] + (col + 3) * pix)
+            self.assertTrue(extent[2] + row * pix < y < extent[2] + (row + 3) * pix)
+            block = canvas[row:row + 3, col:col + 3]
+            np.testing.assert_array_equal(block[..., 3], 1.)
+            # min-max scaled, with rows flipped for origin='lower'
+            np.testing.assert_allclose(block[..., 0], (thumb[::-1] - thumb.min()) / np.ptp(thumb))
+
+    def test_downsample_keeps_edge_colors(self):
+        """Test transparent pixels don't darken the colors they are averaged with."""
+        canvas = np.zeros((2, 2, 4))
+        canvas[0, 0] = 1.
+        np.testing.assert_allclose(_downsample(canvas)[0, 0], (1., 1., 1., 0.25))
+
+    def test_save_pyramid(self):
+        """Test the number of levels and tiles in each level."""
+        canvas = np.random.default_rng(0).random((600, 300, 4))
+        with tempfile.TemporaryDirectory() as d:
+            n_levels = save_pyramid(canvas, d, tile_size=256)
+            n_tiles = [len(os.listdir(os.path.join(d, str(level)))) for level in range(n_levels)]
+            self.assertTrue(os.path.isfile(os.path.join(d, '0', '2_1.png')))
+        self.assertEqual(n_levels, 3)
+        self.assertEqual(n_tiles, [6, 2, 1])
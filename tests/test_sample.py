@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+"""Tests for `nimanifold.data.sample`."""
+
+import os
+import tempfile
+import unittest
+
+import nibabel as nib
+import numpy as np
+import pandas as pd
+from skimage.util import view_as_windows
+from sklearn.preprocessing import scale
+
+from nimanifold.data.sample.features import histogram
+from nimanifold.data.sample.sample import get_samples
+from nimanifold.data.sample.step import _step_data_locs_slices, iter_step_patches
+from nimanifold.data.sample.util import standardize
+
+
+def _sort_rows(x):
+    return x[np.lexsort(x.T)]
+
+
+class TestFeatures(unittest.TestCase):
+    """Tests for the feature extractors."""
+
+    def setUp(self):
+        self.patches = np.random.default_rng(0).normal(size=(6, 4, 4, 4)) * np.arange(1, 7)[:, None, None, None]
+
+    def test_histogram_is_per_patch(self):
+        """Test a patch's histogram does not depend on the rest of its batch."""
+        for value_range in (None, (-5., 5.)):
+            batch = histogram(self.patches, value_range=value_range)
+            single = np.concatenate([histogram(p[None], value_range=value_range) for p in self.patches])
+            np.testing.assert_array_equal(batch, single)
+            np.testing.assert_allclose(batch.sum(axis=1), 1.)
+
+
+class TestStandardize(unittest.TestCase):
+    """Tests for `standardize`."""
+
+    def setUp(self):
+        self.x = np.random.default_rng(0).normal(3., 2., size=(100, 5))
+        self.x[:, 2] = 4.  # constant columns are centered but not scaled
+
+    def test_matches_scale(self):
+        """Test the chunked float64 statistics match `sklearn.preprocessing.scale`."""
+        for chunk_size in (7, 65536):
+            np.testing.assert_allclose(standardize(self.x.copy(), chunk_size), scale(self.x), atol=1e-12)
+
+    def test_float32_in_place(self):
+        """Test float32 data is scaled in place without a float64 copy."""
+        x = self.x.astype(np.float32)
+        out = standardize(x, chunk_size=7)
+        self.assertIs(out, x)
+        self.assertEqual(out.dtype, np.float32)
+        np.testing.assert_allclose(out, scale(self.x), atol=1e-5)
+
+
+class TestStep(unittest.TestCase):
+    """Tests for sampling windows on a grid."""
+
+    def test_no_windows(self):
+        """Test empty outputs keep their trailing shapes, even if the window exceeds the image."""
+        img = np.ones((12, 12, 12), dtype=np.float32)
+        mask = np.zeros(img.shape, dtype=bool)
+        for window, kwargs in ((8, dict(mask=mask)), (16, dict())):
+            for features, n_features in ((None, window ** 3), (['quantiles', 'histogram'], 21)):
+                (data, locs, slices), = _step_data_locs_slices(img, [window], [4], [0.], features, **kwargs)
+                self.assertEqual(data.shape, (0, n_features))
+                self.assertEqual(locs.shape, (0, 3))
+                self.assertEqual(slices.shape, (0, window, window))
+
+    def test_batches_match_all_windows(self):
+        """Test batched windows are the thresholded windows of `view_as_windows` in order."""
+        img = np.random.default_rng(0).random((20, 21, 22)) ** 4
+        windows = view_as_windows(img, 6, step=3)
+        expected = windows[windows.sum(axis=(3, 4, 5)) > 40.]
+        for batch_size in (1, 7, 1024):
+            batches = list(iter_step_patches(img, 6, 3, 40., batch_size))
+            self.assertTrue(all(len(p) <= batch_size for p, _ in batches))
+            np.testing.assert_allclose(np.concatenate([p for p, _ in batches]), expected)
+        self.assertEqual(list(iter_step_patches(img, 6, 3, 1e12)), [])
+
+
+class TestGetSamples(unittest.TestCase):
+    """Tests for `get_samples` on small synthetic volumes."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _csv(self, imgs, masks=None):
+        rows = []
+        for i, img in enumerate(imgs):
+            fn = os.path.join(self.dir.name, f'img{i}.nii.gz')
+            nib.save(nib.Nifti1Image(img, np.eye(4)), fn)
+            rows.append(dict(filename=fn, id=f's{i}'))
+            if masks is not None:
+                rows[-1]['mask'] = os.path.join(self.dir.name, f'mask{i}.nii.gz')
+                nib.save(nib.Nifti1Image(masks[i].astype(np.uint8), np.eye(4)), rows[-1]['mask'])
+        return pd.DataFrame(rows)
+
+    def test_features_keep_distinct_patches(self):
+        """Test patches with equal features are not dropped as duplicates."""
+        img = self.rng.integers(1, 8, size=(48, 48, 48), dtype=np.int16)
+        csv = self._csv([img])
+        raw = get_samples(csv, window=8, step=4, progress=False, dtype=None)
+        features = get_samples(csv, window=8, step=4, progress=False, dtype=None, features='quantiles')
+        self.assertEqual(len(raw), 11 ** 3)
+        self.assertEqual(len(features), len(raw))
+        # deduping raw voxels reorders the rows, so compare the sorted locs
+        np.testing.assert_array_equal(_sort_rows(features.locs), _sort_rows(raw.locs))
+
+    def test_mask_without_windows(self):
+        """Test an image whose mask is empty or has no window with enough coverage is skipped."""
+        imgs = [self.rng.random((32, 32, 32)) for _ in range(4)]
+        masks = [np.zeros((32, 32, 32), dtype=bool) for _ in range(4)]
+        masks[0][4:28, 4:28, 4:28] = True
+        masks[1][10:13, 10:13, 10:13] = True  # too small for any window
+        masks[2][2:30, 2:30, 2:30] = True
+        # masks[3] is empty
+        csv = self._csv(imgs, masks)
+        samples = get_samples(csv, window=[8, 24], step=4, progress=False, mask_coverage=0.9)
+        for w, sample in samples.items():
+            self.assertGreater(len(sample), 0)
+            self.assertEqual(sample.slices.shape[1:], (w, w))
+            np.testing.assert_array_equal(np.unique(sample.ids[:, 0]), [0, 2])
+        samples = get_samples(csv, window=8, n_samples=5, random=True, progress=False)
+        np.testing.assert_array_equal(np.unique(samples.ids[:, 0]), [0, 1, 2])
+        with self.assertRaises(ValueError):
+            get_samples(csv.iloc[1:2], window=8, step=4, progress=False, mask_coverage=0.9)
+        with self.assertRaises(ValueError):
+            get_samples(csv.iloc[3:], window=8, n_samples=5, random=True, progress=False)
+
+    def test_batch_size(self):
+        """Test the batch size does not change the samples."""
+        imgs = [self.rng.random((24, 24, 24)) ** 2 for _ in range(2)]
+        csv = self._csv(imgs)
+        for features in (None, 'quantiles'):
+            expected = get_samples(csv, window=[6, 10], step=3, progress=False, features=features)
+            batched = get_samples(csv, window=[6, 10], step=3, progress=False, features=features, batch_size=7)
+            for w in expected:
+                for name in ('data', 'locs', 'slices', 'ids'):
+                    np.testing.assert_array_equal(getattr(batched[w], name), getattr(expected[w], name))
+
+    def test_threshold_without_windows(self):
+        """Test images without any window over the threshold are skipped."""
+        imgs = [1e11 + self.rng.random((16, 16, 16)), self.rng.random((16, 16, 16))]
+        csv = self._csv(imgs)
+        samples = get_samples(csv, window=4, step=4, threshold=1e12, progress=False)
+        self.assertEqual(len(samples), 4 ** 3)
+        np.testing.assert_array_equal(samples.ids[:, 0], 0)
+        with self.assertRaises(ValueError):
+            get_samples(csv.iloc[1:], window=4, step=4, threshold=1e12, progress=False)
+
+    def test_dtypes(self):
+        """Test the data, locs, and slices dtypes follow `dtype` and `slice_dtype`."""
+        img = self.rng.integers(1, 100, size=(16, 16, 16), dtype=np.int16)
+        csv = self._csv([img])
+        expected = get_samples(csv, window=4, step=4, progress=False)
+        for dtype, slice_dtype, out_dtype, out_slice_dtype in ((np.float64, None, np.float64, np.float64),
+                                                               (np.float32, np.float16, np.float32, np.float16),
+                                                               (None, None, np.float32, np.float32)):
+            samples = get_samples(csv, window=4, step=4, progress=False, dtype=dtype, slice_dtype=slice_dtype)
+            self.assertEqual(samples.data.dtype, out_dtype)
+            self.assertEqual(samples.locs.dtype, out_dtype)
+            self.assertEqual(samples.slices.dtype, out_slice_dtype)
+            np.testing.assert_allclose(samples.data, expected.data, atol=1e-4)
+            np.testing.assert_allclose(samples.slices, expected.slices, rtol=1e-3)
+
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""Tests for `nimanifold.types`."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from nimanifold.types import Sample, SampleView
+
+
+def _colors(codes):
+    return np.eye(3)[codes]
+
+
+class TestSample(unittest.TestCase):
+    """Tests for `Sample` selection and filtering."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        N = 30
+        self.pids = np.arange(N) // 3 + 5  # ids need not start at 0
+        self.sites = np.arange(N) % 2
+        self.contrasts = np.zeros(N, dtype=int)
+        ids = np.column_stack((self.pids, self.sites, self.contrasts))
+        self.sample = Sample(rng.random((N, 4)),
+                             rng.random((N, 3)),
+                             _colors(self.pids % 3),
+                             rng.random((N, 2, 2)),
+                             sites=_colors(self.sites),
+                             ids=ids)
+
+    def test_select(self):
+        """Test boolean, slice, and index selections match numpy indexing."""
+        for idxs in (self.sample.locs[:, 0] > 0.5, slice(3, 20, 2), [4, 1, 1, 29], 7):
+            view = self.sample.select(idxs)
+            self.assertIsInstance(view, SampleView)
+            expected = self.sample.data[idxs].reshape(-1, 4)
+            self.assertEqual(len(view), expected.shape[0])
+            np.testing.assert_array_equal(view.data, expected)
+            np.testing.assert_array_equal(view.ids, self.sample.ids[idxs].reshape(-1, 3))
+            self.assertIsNone(view.contrasts)
+
+    def test_view_composition(self):
+        """Test views of views select from the base Sample."""
+        idxs = np.arange(len(self.sample))
+        for outer, inner in ((slice(2, 25, 3), slice(1, None, 2)),
+                             (slice(None, None, -1), [0, 2, 5]),
+                             ([3, 9, 4, 20], slice(1, 3)),
+                             (idxs % 2 == 0, np.arange(15) > 10)):
+            view = self.sample[outer][inner]
+            self.assertIs(view._parent, self.sample)
+            expected = idxs[outer][inner]
+            np.testing.assert_array_equal(view.data, self.sample.data[expected])
+            np.testing.assert_array_equal(view.labels('pids'), self.pids[expected])
+
+    def test_view_writes_stay_on_view(self):
+        """Test setting a field on a view neither writes through nor composes."""
+        view = self.sample[:10]
+        view.data = np.zeros((10, 4))
+        self.assertFalse(np.any(self.sample.data[:10] == 0.))
+        child = view[2:4]
+        self.assertIs(child._parent, view)
+        np.testing.assert_array_equal(child.data, np.zeros((2, 4)))
+
+    def test_filter(self):
+        """Test filtering by the csv's ids and by location."""
+        out = self.sample.filter(pids=[5, 9], sites=[1])
+        expected = np.isin(self.pids, [5, 9]) & (self.sites == 1)
+        np.testing.assert_array_equal(out.data, self.sample.data[expected])
+        np.testing.assert_array_equal(out.labels('pids'), self.pids[expected])
+        out = self.sample.filter(lo=(0.2, 0.2, 0.2), hi=(0.8, 0.8, 0.8))
+        expected = np.all((self.sample.locs >= 0.2) & (self.sample.locs <= 0.8), axis=1)
+        np.testing.assert_array_equal(out.locs, self.sample.locs[expected])
+        out = self.sample[::2].filter(pids=[6])
+        np.testing.assert_array_equal(out.data, self.sample.data[[4]])
+
+    def test_filter_without_ids(self):
+        """Test filtering by id needs ids, and labels fall back to color ranks."""
+        sample = self.sample.materialize()
+        sample.ids = None
+        with self.assertRaises(ValueError):
+            sample.filter(pids=[5])
+        self.assertEqual(len(sample.filter(lo=(0., 0., 0.))), len(sample))
+        codes = sample.labels('sites')
+        self.assertEqual(len(np.unique(codes)), 2)
+        np.testing.assert_array_equal(codes[self.sites == 0], codes[0])
+        with self.assertRaises(ValueError):
+            sample.labels('contrasts')
+
+    def test_hdf5_roundtrip(self):
+        """Test ids survive saving and loading."""
+        with tempfile.TemporaryDirectory() as d:
+            fn = os.path.join(d, 'sample.h5')
+            self.sample[5:].to_hdf5(fn)
+            out = Sample.from_hdf5(fn)
+        np.testing.assert_array_equal(out.ids, self.sample.ids[5:])
+        np.testing.assert_array_equal(out.filter(pids=[7]).data, self.sample.data[6:9])
+
+    def test_astype(self):
+        """Test data and locs take `dtype` and slices `slice_dtype`, leaving the Sample unchanged."""
+        out = self.sample.astype(np.float32, np.float16)
+        self.assertEqual((out.data.dtype, out.locs.dtype, out.slices.dtype), (np.float32, np.float32, np.float16))
+        self.assertEqual(self.sample.data.dtype, np.float64)
+        self.assertIs(out.ids, self.sample.ids)
+        out = self.sample[:5].astype(np.float32)
+        self.assertEqual((len(out), out.slices.dtype), (5, np.float32))
+
+    def test_hdf5_dtypes(self):
+        """Test datasets are cast when written."""
+        with tempfile.TemporaryDirectory() as d:
+            fn = os.path.join(d, 'sample.h5')
+            self.sample.to_hdf5(fn, dtype=np.float32, slice_dtype=np.float16)
+            out = Sample.from_hdf5(fn)
+        self.assertEqual((out.data.dtype, out.locs.dtype, out.slices.dtype), (np.float32, np.float32, np.float16))
+        self.assertEqual(out.pids.dtype, np.float64)
+        np.testing.assert_allclose(out.slices, self.sample.slices, rtol=1e-3)
+
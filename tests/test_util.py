@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+
+"""Tests for `nimanifold.util`."""
+
+import unittest
+
+import numpy as np
+
+from nimanifold.util import unique_rows
+
+
+class TestUniqueRows(unittest.TestCase):
+    """Tests for `unique_rows`."""
+
+    def test_matches_numpy(self):
+        """Test the first indices and codes group rows like `np.unique` over rows."""
+        x = np.random.default_rng(0).integers(0, 3, size=(200, 3))
+        first, codes = unique_rows(x)
+        _, expected_first, expected_codes = np.unique(x, axis=0, return_index=True, return_inverse=True)
+        np.testing.assert_array_equal(np.sort(first), np.sort(expected_first))
+        np.testing.assert_array_equal(first[codes], expected_first[expected_codes.ravel()])